@@ -20,6 +20,7 @@ import time
 from threading import Lock
 from typing import Dict, List, Tuple, Union
 
+import cache
 import emojis
 import gdrive
 import pagination
@@ -32,6 +33,7 @@ import pss_core as core
 import pss_crew as crew
 import pss_daily as daily
 import pss_dropship as dropship
+import pss_entity as entity
 import pss_exception
 import pss_fleet as fleet
 import pss_item as item
@@ -90,9 +92,17 @@ logging.basicConfig(
     datefmt = '%Y%m%d %H:%M:%S',
     format = '{asctime} [{levelname:<8}] {name}: {message}')
 
-bot = discord.ext.commands.Bot(command_prefix=get_prefix,
-                               description='This is a Discord Bot for Pixel Starships',
-                               activity=ACTIVITY)
+class YaDcBot(discord.ext.commands.Bot):
+    async def close(self) -> None:
+        await super().close()
+        crew.stop_prestige_graph_updates()
+        await cache.shutdown()
+        await core.shutdown()
+
+
+bot = YaDcBot(command_prefix=get_prefix,
+              description='This is a Discord Bot for Pixel Starships',
+              activity=ACTIVITY)
 
 setattr(bot, 'logger', logging.getLogger('bot.py'))
 
@@ -113,6 +123,7 @@ async def on_ready() -> None:
     print(f'Current Working Directory: {PWD}')
     print(f'Bot logged in as {bot.user.name} (id={bot.user.id}) on {len(bot.guilds)} servers')
     await core.init()
+    await cache.init()
     schema_version = await core.db_get_schema_version()
     await server_settings.init()
     await login.init()
@@ -442,6 +453,35 @@ async def cmd_prestige(ctx: discord.ext.commands.Context, *, crew_name: str):
     await util.post_output(ctx, output)
 
 
+@bot.command(brief='Find a way to prestige crew into another', name='prestigepath')
+@discord.ext.commands.cooldown(rate=RATE, per=COOLDOWN, type=discord.ext.commands.BucketType.user)
+async def cmd_prestigepath(ctx: discord.ext.commands.Context, *, crew_names: str):
+    """
+    Find a sequence of prestiges turning the crew specified into the target crew.
+
+    Usage:
+      /prestigepath [crew_name] + [crew_name] (+ ...) to [target_crew_name]
+
+    Parameters:
+      crew_name: (Part of) the name of a crew to be prestiged. Specify a crew multiple times, if you have several of it. Mandatory.
+      target_crew_name: (Part of) the name of the crew to be prestiged into. Mandatory.
+
+    Examples:
+      /prestigepath alpaco + bubble bun + xin + pierre to lady lucky - Will print the prestige steps needed to get 'Lady Lucky' from the crew specified, if there are any.
+
+    Notes:
+      This command is only available, if all prestige recipes have been loaded in the background. It will only find paths with a limited number of prestige steps.
+    """
+    async with ctx.typing():
+        match = re.match(r'(.+)\s+to\s+(.+)$', crew_names, re.IGNORECASE)
+        if match:
+            char_names = [char_name.strip() for char_name in match.group(1).split('+')]
+            output, _ = await crew.get_prestige_path_info(char_names, match.group(2).strip())
+        else:
+            output = ['Please specify the crew to be prestiged and the target crew like this: `/prestigepath [crew_name] + [crew_name] to [target_crew_name]`']
+    await util.post_output(ctx, output)
+
+
 @bot.command(brief='Get character recipes', name='recipe')
 @discord.ext.commands.cooldown(rate=RATE, per=COOLDOWN, type=discord.ext.commands.BucketType.user)
 async def cmd_recipe(ctx: discord.ext.commands.Context, *, crew_name: str):
@@ -945,6 +985,27 @@ async def cmd_top(ctx: discord.ext.commands.Context, count: int = 100):
         await ctx.invoke(cmd, count=count)
 
 
+@cmd_top.command(brief='Prints top crew by stat', name='crew', aliases=['char', 'character', 'characters', 'chars'])
+async def cmd_top_crew(ctx: discord.ext.commands.Context, stat: str, level: int = crew.CREW_MAX_LEVEL, count: int = 10):
+    """
+    Prints the crew having the highest value of a stat at a certain level. Prints top 10 crew at level 40 by default.
+
+    Usage:
+      /top crew [stat] <level> <count>
+
+    Parameters:
+      stat:  The crew stat to rank the crew by. Mandatory. Valid values are: [hp, health, attack, atk, att, damage, dmg, repair, rep, ability, abl, pilot, plt, science, sci, engine, eng, weapon, wpn]
+      level: The level of the crew. Optional.
+      count: The number of rows to be printed. Optional.
+
+    Examples:
+      /top crew atk - prints the top 10 crew by attack at level 40.
+      /top crew hp 20 25 - prints the top 25 crew by HP at level 20."""
+    async with ctx.typing():
+        output, _ = await crew.get_top_crew_by_stat(stat, level=level, count=count)
+    await util.post_output(ctx, output)
+
+
 @cmd_top.command(brief='Prints top fleets', name='fleets', aliases=['alliances'])
 async def cmd_top_fleets(ctx: discord.ext.commands.Context, count: int = 100):
     """
@@ -1208,12 +1269,8 @@ async def cmd_updatecache(ctx: discord.ext.commands.Context):
     async with ctx.typing():
         await crew.characters_designs_retriever.update_cache()
         await crew.collections_designs_retriever.update_cache()
-        prestige_to_caches = list(crew.__prestige_to_cache_dict.values())
-        for prestige_to_cache in prestige_to_caches:
-            await prestige_to_cache.update_data()
-        prestige_from_caches = list(crew.__prestige_from_cache_dict.values())
-        for prestige_from_cache in prestige_from_caches:
-            await prestige_from_cache.update_data()
+        for prestige_cache in crew.get_prestige_caches():
+            await prestige_cache.update_data()
         await item.items_designs_retriever.update_cache()
         await research.researches_designs_retriever.update_cache()
         await room.rooms_designs_retriever.update_cache()
@@ -1986,6 +2043,28 @@ async def cmd_test(ctx: discord.ext.commands.Context, action, *, params = None):
     elif action == 'commands':
         output = [', '.join(sorted(bot.all_commands.keys()))]
         await util.post_output(ctx, output)
+    elif action == 'xmlparity':
+        backend_names = [params] if params else [backend_name for backend_name in core.get_xml_parser_backend_names() if backend_name != 'stdlib']
+        output = []
+        for backend_name in backend_names:
+            if backend_name not in core.get_xml_parser_backend_names():
+                output.append(f'The xml parser backend \'{backend_name}\' is not available.')
+                continue
+            for retriever in entity.get_entity_designs_retrievers():
+                raw_data = await retriever.get_raw_data()
+                try:
+                    is_equal = core.check_xml_parser_backend_parity(raw_data, backend_name)
+                    result = 'identical' if is_equal else 'DIFFERENT'
+                except Exception as error:
+                    result = f'{error.__class__.__name__}: {error}'
+                output.append(f'{backend_name} - {retriever.cache_name}: {result}')
+        if not output:
+            output.append('There are no alternative xml parser backends available.')
+        await util.post_output(ctx, output)
+    elif action == 'lookupstats':
+        output = [f'{retriever.cache_name}: {retriever.lookup_memo.get_stats_as_text()}' for retriever in entity.get_entity_designs_retrievers()]
+        output.extend(crew.get_prestige_caches_stats_as_text())
+        await util.post_output(ctx, output)
 
 
 @bot.group(brief='list available devices', name='device', hidden=True)
@@ -2113,4 +2192,6 @@ async def cmd_device_select(ctx: discord.ext.commands.Context, device_key: str):
 if __name__ == '__main__':
     print(f'discord.py version: {discord.__version__}')
     token = str(os.environ.get('DISCORD_BOT_TOKEN'))
+    # Parse workers must get forked before the bot connects
+    core.init_xml_parsing()
     bot.run(token)
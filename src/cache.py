@@ -1,138 +1,461 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 
+import asyncio
+from collections import namedtuple, OrderedDict
 import datetime
-from threading import Thread, Lock
-import time
+import hashlib
 import random
+import time
+from typing import Callable, Dict, Hashable, List, Tuple
+import zlib
 
 import pss_core as core
+import settings
 import utility as util
 
 
+PssCacheSnapshot = namedtuple('PssCacheSnapshot', ['compressed_data', 'data_digest', 'data_dict3', 'modify_date', 'version', 'views'])
+
+
 class PssCache:
-    def __init__(self, update_path: str, name: str, key_name: str = None, update_interval: int = 10):
+    """
+    Holds the latest data retrieved from the update path as an immutable snapshot.
+
+    Readers always get the current snapshot. Refreshes are serialized by an asyncio.Lock and swap in a new snapshot once the data has been retrieved and parsed, so readers never have to wait for a write to finish.
+
+    The data is parsed once per refresh. If a refresh retrieves data with the same digest as the current data, only the modify date gets updated and the data version as well as all derived views are kept. The raw data is only kept zlib-compressed and gets decompressed on demand by get_raw_data(). Derived views registered via register_view() are computed once per data version on first access.
+
+    If background_refresh is True, the cache will be refreshed by the background refresh scheduler shortly before it expires. While the scheduler is running, readers will be served the current snapshot and only wait for an upstream fetch, if there's no data at all, yet.
+    The raw data of such caches also gets persisted to the database, so that after a restart the cache can start with the last known data and revalidate it in the background.
+    """
+    def __init__(self, update_path: str, name: str, key_name: str = None, update_interval: int = 10, background_refresh: bool = False):
         self.__update_path: str = update_path
         self.__name: str = name
         self.__obj_key_name: str = key_name
         self.__UPDATE_INTERVAL: datetime.timedelta = datetime.timedelta(minutes=update_interval)
         self.__UPDATE_INTERVAL_ORIG: int = update_interval
 
-        self.__data: str = None
-        self.__modify_date: datetime.datetime = None
-        self.__WRITE_LOCK: Lock = Lock()
-        self.__READ_LOCK: Lock = Lock()
-        self.__write_requested: bool = False
-        self.__reader_count: int = 0
+        self.__snapshot: PssCacheSnapshot = None
+        self.__update_lock: asyncio.Lock = None
+        self.__version: int = 0
+        self.__view_functions: Dict[str, Callable[[dict], object]] = {}
+        self.__background_refresh: bool = background_refresh
+        self.__persisted_snapshot_loaded: bool = False
+
+        if background_refresh:
+            register_background_refresh(self)
 
 
+    @property
+    def data_version(self) -> int:
+        """
+        Monotonically increasing version of the data. Only increases, if the data has actually changed.
+        """
+        return self.__version
+
     @property
     def name(self) -> str:
         return self.__name
 
 
-    async def update_data(self, old_data=None) -> bool:
-        util.dbg_prnt(f'+ PssCache[{self.name}].update_data(old_data)')
-        util.dbg_prnt(f'[PssCache[{self.name}].update_data] Fetch data from path: {self.__update_path}')
-        data = await core.get_data_from_path(self.__update_path)
-        util.dbg_prnt(f'[PssCache[{self.name}].update_data] Retrieved {len(data)} bytes')
-        data_changed = data != old_data
-        if data_changed:
-            self.__request_write()
-            can_write = False
-            while not can_write:
-                can_write = self.__get_reader_count() == 0
-                if not can_write:
-                    time.sleep(random.random())
-            self.__write_data(data)
-            self.__finish_write()
-            return True
-        return False
+    async def update_data(self) -> bool:
+        """
+        Retrieves the data from the update path. Returns True, if the data has changed.
+        """
+        async with self.__get_update_lock():
+            return await self.__update_data()
 
 
     async def get_raw_data(self) -> str:
+        snapshot = await self.__get_snapshot()
+        return _decompress_data(snapshot.compressed_data)
+
+
+    async def get_data_dict3(self) -> dict:
+        """
+        Returns the parsed data. The returned dict is shared with other readers and must not be modified.
+        """
+        snapshot = await self.__get_snapshot()
+        return snapshot.data_dict3
+
+
+    async def load_persisted_snapshot(self) -> bool:
+        """
+        Loads the data persisted in the database, if there's no data in the cache, yet. Returns True, if data has been loaded.
+        """
+        async with self.__get_update_lock():
+            return await self.__load_persisted_snapshot()
+
+
+    def get_seconds_to_next_refresh(self) -> float:
+        """
+        Returns the number of seconds until the background refresh scheduler should refresh this cache. Refreshes are scheduled ahead of expiry with a random jitter, so that caches with the same update interval don't get refreshed all at once.
+        """
+        snapshot = self.__snapshot
+        if snapshot is None:
+            return 0.0
+        update_interval = self.__UPDATE_INTERVAL.total_seconds()
+        refresh_ahead = update_interval * (settings.CACHE_REFRESH_AHEAD_RATIO + random.random() * settings.CACHE_REFRESH_JITTER_RATIO)
+        seconds_since_update = (util.get_utcnow() - snapshot.modify_date).total_seconds()
+        result = update_interval - refresh_ahead - seconds_since_update
+        return max(result, 0.0)
+
+
+    def register_view(self, view_name: str, create_view: Callable[[dict], object]) -> None:
+        """
+        Registers a view derived from the parsed data. The function create_view receives the parsed data and will be called once per data version.
+        """
+        self.__view_functions[view_name] = create_view
+
+
+    async def get_view(self, view_name: str) -> object:
+        snapshot = await self.__get_snapshot()
+        if view_name not in snapshot.views:
+            util.dbg_prnt(f'[PssCache[{self.name}].get_view] Creating view \'{view_name}\' for version {snapshot.version}')
+            snapshot.views[view_name] = self.__view_functions[view_name](snapshot.data_dict3)
+        return snapshot.views[view_name]
+
+
+    async def __get_snapshot(self) -> PssCacheSnapshot:
         util.dbg_prnt(f'+ PssCache[{self.name}].get_data()')
-        if self.__get_is_data_outdated():
+        snapshot = self.__snapshot
+        if snapshot is None:
+            await self.__initialize_data()
+        elif self.__background_refresh and is_background_refresh_running():
+            pass
+        elif self.__get_is_data_outdated(snapshot) and not self.__get_update_lock().locked():
             util.dbg_prnt(f'[PssCache[{self.name}].get_data] Data is outdated')
-            await self.update_data()
+            try:
+                await self.__update_data_if_outdated()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                print(f'[PssCache[{self.name}].get_data] {error.__class__.__name__} occurred while updating the data. Returning outdated data: {error}')
+        return self.__snapshot
 
-        can_read = False
-        while not can_read:
-            can_read = not self.__get_write_requested()
-            if not can_read:
-                time.sleep(random.random())
 
-        self.__add_reader()
-        result = self.__read_data()
-        self.__remove_reader()
-        return result
+    async def __update_data(self) -> bool:
+        util.dbg_prnt(f'+ PssCache[{self.name}].update_data()')
+        util.dbg_prnt(f'[PssCache[{self.name}].update_data] Fetch data from path: {self.__update_path}')
+        data = await core.get_data_from_path(self.__update_path)
+        util.dbg_prnt(f'[PssCache[{self.name}].update_data] Retrieved {len(data)} bytes')
+        data_digest = _get_data_digest(data)
+        snapshot = self.__snapshot
+        if snapshot is not None and snapshot.data_digest == data_digest:
+            self.__snapshot = snapshot._replace(modify_date=util.get_utcnow())
+            util.dbg_prnt(f'[PssCache[{self.name}].update_data] Data is unchanged, keeping version {snapshot.version}')
+            return False
+        await self.__write_data(data, util.get_utcnow(), data_digest=data_digest)
+        if self.__background_refresh:
+            await _db_try_store_cache_snapshot(self.name, self.__snapshot.modify_date, self.__snapshot.compressed_data)
+        return True
+
+
+    async def __initialize_data(self) -> None:
+        async with self.__get_update_lock():
+            if self.__snapshot is None:
+                await self.__load_persisted_snapshot()
+            if self.__snapshot is None:
+                await self.__update_data()
+
+
+    async def __load_persisted_snapshot(self) -> bool:
+        if self.__snapshot is not None or self.__persisted_snapshot_loaded or not self.__background_refresh:
+            return False
+        self.__persisted_snapshot_loaded = True
+        modify_date, data = await _db_get_cache_snapshot(self.name)
+        if data:
+            try:
+                await self.__write_data(data, modify_date)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                print(f'[PssCache[{self.name}].load_persisted_snapshot] {error.__class__.__name__} occurred while loading the persisted data: {error}')
+                return False
+            util.dbg_prnt(f'[PssCache[{self.name}].load_persisted_snapshot] Loaded {len(data)} bytes from {modify_date}')
+            return True
+        return False
 
 
-    async def get_data_dict3(self) -> dict:
-        data = await self.get_raw_data()
-        return dict(core.xmltree_to_dict3(data))
+    async def __update_data_if_outdated(self) -> None:
+        async with self.__get_update_lock():
+            # Another coroutine may have updated the data while this one was waiting for the lock.
+            if self.__get_is_data_outdated(self.__snapshot):
+                await self.__update_data()
 
 
-    def __get_is_data_outdated(self) -> bool:
-        if self.__UPDATE_INTERVAL_ORIG == 0:
+    def __get_is_data_outdated(self, snapshot: PssCacheSnapshot) -> bool:
+        if snapshot is None or self.__UPDATE_INTERVAL_ORIG == 0:
             return True
 
         utc_now = util.get_utcnow()
-        self.__WRITE_LOCK.acquire()
-        modify_date = self.__modify_date
-        self.__WRITE_LOCK.release()
-        result = modify_date is None or utc_now - modify_date > self.__UPDATE_INTERVAL
+        result = utc_now - snapshot.modify_date > self.__UPDATE_INTERVAL
         return result
 
 
-    def __get_reader_count(self) -> int:
-        self.__READ_LOCK.acquire()
-        result = self.__reader_count
-        self.__READ_LOCK.release()
-        return result
+    async def __write_data(self, data: str, modify_date: datetime.datetime, data_digest: bytes = None) -> None:
+        # Large payloads get parsed in an executor, so that the bot stays responsive during refreshes.
+        data_dict3 = await core.xmltree_to_dict3_async(data)
+        compressed_data = _compress_data(data)
+        if data_digest is None:
+            data_digest = _get_data_digest(data)
+        self.__version += 1
+        self.__snapshot = PssCacheSnapshot(compressed_data, data_digest, data_dict3, modify_date, self.__version, {})
+        util.dbg_prnt(f'[PssCache[{self.name}].__write_data] Stored {len(data)} bytes ({len(compressed_data)} bytes compressed) on {modify_date}')
 
 
-    def __get_write_requested(self) -> bool:
-        self.__WRITE_LOCK.acquire()
-        result = self.__write_requested
-        self.__WRITE_LOCK.release()
-        return result
+    def __get_update_lock(self) -> asyncio.Lock:
+        # Create the lock lazily, so that it gets bound to the event loop running the bot.
+        if self.__update_lock is None:
+            self.__update_lock = asyncio.Lock()
+        return self.__update_lock
 
 
-    def __request_write(self) -> None:
-        self.__WRITE_LOCK.acquire()
-        self.__write_requested = True
-        self.__WRITE_LOCK.release()
 
 
-    def __finish_write(self) -> None:
-        self.__WRITE_LOCK.acquire()
-        self.__write_requested = False
-        self.__WRITE_LOCK.release()
 
 
-    def __write_data(self, data) -> None:
-        self.__WRITE_LOCK.acquire()
-        self.__data = data
-        self.__modify_date = util.get_utcnow()
-        util.dbg_prnt(f'[PssCache[{self.name}].__write_data] Stored {len(data)} bytes on {self.__modify_date}')
-        self.__WRITE_LOCK.release()
 
 
-    def __add_reader(self) -> None:
-        self.__READ_LOCK.acquire()
-        self.__reader_count = self.__reader_count + 1
-        self.__READ_LOCK.release()
 
 
-    def __remove_reader(self) -> None:
-        self.__READ_LOCK.acquire()
-        self.__reader_count = self.__reader_count - 1
-        self.__READ_LOCK.release()
+class LruCache:
+    """
+    Holds up to max_size values. If it's full, the least recently used value will be evicted. If idle_ttl is specified, values that haven't been accessed for longer than that will expire. Counts hits and misses of lookups as well as evictions and expirations.
+    """
+    def __init__(self, max_size: int, idle_ttl: datetime.timedelta = None):
+        self.__max_size: int = max_size
+        self.__idle_ttl_seconds: float = idle_ttl.total_seconds() if idle_ttl else None
+        self.__entries: OrderedDict = OrderedDict()
+        self.__last_access: Dict[Hashable, float] = {}
+        self.__hits: int = 0
+        self.__misses: int = 0
+        self.__evictions: int = 0
+        self.__expirations: int = 0
 
 
-    def __read_data(self) -> str:
-        self.__WRITE_LOCK.acquire()
-        result = self.__data
-        self.__WRITE_LOCK.release()
-        return result
+    @property
+    def evictions(self) -> int:
+        return self.__evictions
+
+    @property
+    def expirations(self) -> int:
+        return self.__expirations
+
+    @property
+    def hits(self) -> int:
+        return self.__hits
+
+    @property
+    def max_size(self) -> int:
+        return self.__max_size
+
+    @property
+    def misses(self) -> int:
+        return self.__misses
+
+    @property
+    def size(self) -> int:
+        return len(self.__entries)
+
+
+    def clear(self) -> None:
+        self.__entries.clear()
+        self.__last_access.clear()
+
+
+    def get(self, key: Hashable, default: object = None) -> object:
+        self.__remove_expired()
+        if key in self.__entries:
+            self.__entries.move_to_end(key)
+            self.__last_access[key] = time.monotonic()
+            self.__hits += 1
+            return self.__entries[key]
+        self.__misses += 1
+        return default
+
+
+    def set(self, key: Hashable, value: object) -> None:
+        self.__remove_expired()
+        self.__entries[key] = value
+        self.__entries.move_to_end(key)
+        self.__last_access[key] = time.monotonic()
+        while len(self.__entries) > self.__max_size:
+            evicted_key, _ = self.__entries.popitem(last=False)
+            self.__last_access.pop(evicted_key, None)
+            self.__evictions += 1
+
+
+    def values(self) -> List[object]:
+        """
+        Returns the values, that haven't expired, from least to most recently used. Doesn't count as an access.
+        """
+        self.__remove_expired()
+        return list(self.__entries.values())
+
+
+    def get_stats_as_text(self) -> str:
+        lookups = self.__hits + self.__misses
+        hit_rate = self.__hits / lookups * 100 if lookups else 0.0
+        return f'{self.size}/{self.__max_size} entries, {self.__hits} hits, {self.__misses} misses ({hit_rate:.1f} % hit rate), {self.__evictions} evictions, {self.__expirations} expirations'
+
+
+    def __remove_expired(self) -> None:
+        if self.__idle_ttl_seconds is None:
+            return
+        # The entries are ordered by last access, so expired entries can only be found at the front.
+        expire_before = time.monotonic() - self.__idle_ttl_seconds
+        while self.__entries:
+            key = next(iter(self.__entries))
+            if self.__last_access[key] >= expire_before:
+                break
+            del self.__entries[key]
+            del self.__last_access[key]
+            self.__expirations += 1
+
+
+
+
+
+
+
+
+
+
+# ---------- Background refresh ----------
+
+__BACKGROUND_REFRESH_CACHES: Dict[str, PssCache] = {}
+__BACKGROUND_REFRESH_TASKS: Dict[str, asyncio.Future] = {}
+__background_refresh_running: bool = False
+
+
+def register_background_refresh(cache: PssCache) -> None:
+    """
+    Registers a cache for the background refresh. A cache registered earlier under the same name gets replaced and won't be refreshed anymore.
+    """
+    __BACKGROUND_REFRESH_CACHES[cache.name] = cache
+    __stop_background_refresh_task(cache.name)
+    if __background_refresh_running:
+        __start_background_refresh_task(cache)
+
+
+def is_background_refresh_running() -> bool:
+    return __background_refresh_running
+
+
+def start_background_refresh() -> None:
+    global __background_refresh_running
+    if not __background_refresh_running:
+        __background_refresh_running = True
+        for cache in __BACKGROUND_REFRESH_CACHES.values():
+            __start_background_refresh_task(cache)
+
+
+def stop_background_refresh() -> None:
+    global __background_refresh_running
+    __background_refresh_running = False
+    for task in __BACKGROUND_REFRESH_TASKS.values():
+        task.cancel()
+    __BACKGROUND_REFRESH_TASKS.clear()
+
+
+def __start_background_refresh_task(cache: PssCache) -> None:
+    task = asyncio.ensure_future(__background_refresh_loop(cache))
+    __BACKGROUND_REFRESH_TASKS[cache.name] = task
+
+
+def __stop_background_refresh_task(cache_name: str) -> None:
+    task = __BACKGROUND_REFRESH_TASKS.pop(cache_name, None)
+    if task is not None:
+        task.cancel()
+
+
+async def __background_refresh_loop(cache: PssCache) -> None:
+    try:
+        await cache.load_persisted_snapshot()
+    except asyncio.CancelledError:
+        raise
+    except Exception as error:
+        print(f'[background_refresh_loop] {error.__class__.__name__} occurred while loading the persisted data of cache \'{cache.name}\': {error}')
+    while True:
+        await asyncio.sleep(cache.get_seconds_to_next_refresh())
+        try:
+            await cache.update_data()
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            print(f'[background_refresh_loop] {error.__class__.__name__} occurred while refreshing cache \'{cache.name}\': {error}')
+            await asyncio.sleep(settings.CACHE_REFRESH_RETRY_DELAY.total_seconds())
+
+
+
+
+
+
+
+
+
+
+# ---------- Helper ----------
+
+def _compress_data(data: str) -> bytes:
+    return zlib.compress(data.encode('utf-8'), settings.CACHE_DATA_COMPRESSION_LEVEL)
+
+
+def _decompress_data(compressed_data: bytes) -> str:
+    return zlib.decompress(compressed_data).decode('utf-8')
+
+
+def _get_data_digest(data: str) -> bytes:
+    return hashlib.sha256(data.encode('utf-8')).digest()
+
+
+
+
+
+
+
+
+
+
+# ---------- DB ----------
+
+async def _db_get_cache_snapshot(cache_name: str) -> Tuple[datetime.datetime, str]:
+    query = f'SELECT modifydate, data FROM cachesnapshots WHERE cachename = $1'
+    try:
+        rows = await core.db_fetchall(query, [cache_name])
+    except asyncio.CancelledError:
+        raise
+    except Exception as error:
+        core.print_db_query_error('_db_get_cache_snapshot', query, [cache_name], error)
+        rows = None
+    if rows:
+        modify_date, data = rows[0]
+        if data:
+            return (modify_date, _decompress_data(data))
+    return (None, None)
+
+
+async def _db_try_store_cache_snapshot(cache_name: str, modify_date: datetime.datetime, compressed_data: bytes) -> bool:
+    query = f'INSERT INTO cachesnapshots (cachename, modifydate, data) VALUES ($1, $2, $3) ON CONFLICT (cachename) DO UPDATE SET modifydate = $2, data = $3'
+    success = await core.db_try_execute(query, [cache_name, modify_date, compressed_data])
+    return success
+
+
+
+
+
+
+
+
+
+
+# ---------- Initialization ----------
+
+async def init():
+    start_background_refresh()
+
+
+async def shutdown():
+    stop_background_refresh()
@@ -4,17 +4,27 @@
 import aiohttp
 import asyncio
 import asyncpg
+from collections import namedtuple
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
 import contextlib
 from datetime import datetime
 import discord
+import heapq
 import json
 import psycopg2
 from psycopg2 import errors as db_error
 import re
+import sys
 from threading import Lock
-from typing import Callable, Dict, List, Tuple, Union
+from typing import Callable, Dict, Iterable, List, Set, Tuple, Union
 import xml.etree.ElementTree
 
+try:
+    import lxml.etree
+except ImportError:
+    lxml = None
+
 import data
 import pss_daily as daily
 import pss_lookups as lookups
@@ -28,6 +38,129 @@ import utility as util
 # ---------- Constants ----------
 
 DB_CONN: asyncpg.pool.Pool = None
+HTTP_SESSION: aiohttp.ClientSession = None
+
+__IN_FLIGHT_REQUESTS: Dict[str, asyncio.Future] = {}
+
+PROPERTY_VALUE_NGRAM_LENGTH: int = 3
+
+__XML_STREAM_CHUNK_SIZE: int = 65536
+__xml_parse_executor: concurrent.futures.Executor = None
+
+PropertyValueIndex = namedtuple('PropertyValueIndex', ['ids_by_value', 'values_by_ngram'])
+
+
+
+
+
+
+
+
+
+
+# ---------- Classes ----------
+
+class XmlAttribDict(dict):
+    """
+    Holds the attributes of an xml element. The values of attributes ending on 'Xml' contain raw xml. They get converted to a dict on first access of the attribute name without the 'Xml' suffix (e.g. 'Foo' for 'FooXml') and the result is stored in this dict.
+    Only the methods __getitem__, __contains__ and get are aware of these keys. Until a key has been accessed, it won't be returned by keys(), items() or when iterating this dict.
+    """
+    def __missing__(self, key: str) -> dict:
+        raw_xml = self.__get_raw_xml(key)
+        if raw_xml is None:
+            raise KeyError(key)
+        result = convert_raw_xml_to_dict(raw_xml)
+        self[key] = result
+        return result
+
+
+    def __contains__(self, key: str) -> bool:
+        return dict.__contains__(self, key) or self.__get_raw_xml(key) is not None
+
+
+    def get(self, key: str, default: object = None) -> object:
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        if self.__get_raw_xml(key) is not None:
+            return self[key]
+        return default
+
+
+    def __get_raw_xml(self, key: str) -> str:
+        if isinstance(key, str):
+            raw_xml = dict.get(self, f'{key}Xml', None)
+            if raw_xml:
+                return raw_xml
+        return None
+
+
+
+
+
+
+
+
+
+
+# ---------- XML Parser Backends ----------
+
+XmlParserBackend = namedtuple('XmlParserBackend', ['name', 'fromstring', 'create_pull_parser', 'prepare_text'])
+
+
+def __lxml_prepare_text(raw_text: str) -> bytes:
+    # lxml refuses to parse str containing an encoding declaration
+    return raw_text.encode('utf-8')
+
+
+__XML_PARSER_BACKENDS: Dict[str, XmlParserBackend] = {
+    'stdlib': XmlParserBackend(
+        'stdlib',
+        xml.etree.ElementTree.fromstring,
+        lambda: xml.etree.ElementTree.XMLPullParser(events=('start', 'end')),
+        lambda raw_text: raw_text
+    )
+}
+if lxml is not None:
+    __XML_PARSER_BACKENDS['lxml'] = XmlParserBackend(
+        'lxml',
+        lambda raw_xml: lxml.etree.fromstring(__lxml_prepare_text(raw_xml)),
+        lambda: lxml.etree.XMLPullParser(events=('start', 'end')),
+        __lxml_prepare_text
+    )
+
+__xml_parser_backend: XmlParserBackend = __XML_PARSER_BACKENDS['stdlib']
+
+
+def get_xml_parser_backend() -> XmlParserBackend:
+    return __xml_parser_backend
+
+
+def get_xml_parser_backend_names() -> List[str]:
+    return list(__XML_PARSER_BACKENDS.keys())
+
+
+def select_xml_parser_backend(backend_name: str = None) -> XmlParserBackend:
+    """
+    Selects the backend used for parsing xml. If backend_name is not specified, the backend configured in settings.XML_PARSER_BACKEND will be selected. Falls back to the stdlib backend, if the requested backend is not available.
+    """
+    global __xml_parser_backend
+    backend_name = (backend_name or settings.XML_PARSER_BACKEND).lower()
+    if backend_name not in __XML_PARSER_BACKENDS.keys():
+        print(f'[select_xml_parser_backend] The xml parser backend \'{backend_name}\' is not available. Using the stdlib backend.')
+        backend_name = 'stdlib'
+    __xml_parser_backend = __XML_PARSER_BACKENDS[backend_name]
+    return __xml_parser_backend
+
+
+def check_xml_parser_backend_parity(raw_xml: str, backend_name: str) -> bool:
+    """
+    Converts the raw xml with the stdlib backend and the specified backend and returns True, if both produce identical dicts. The selected backend doesn't change, so parsing elsewhere won't be affected.
+    """
+    results = []
+    for name in ('stdlib', backend_name):
+        backend = __XML_PARSER_BACKENDS[name]
+        results.append(repr((convert_raw_xml_to_dict(raw_xml, backend=backend), xmltree_to_dict3(raw_xml, backend=backend))))
+    return results[0] == results[1]
 
 
 
@@ -41,22 +174,129 @@ DB_CONN: asyncpg.pool.Pool = None
 # ---------- Utilities ----------
 
 async def get_data_from_url(url: str) -> str:
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            data = await response.text(encoding='utf-8')
+    session = get_http_session()
+    async with session.get(url) as response:
+        data = await response.text(encoding='utf-8')
     return data
 
 
 async def get_data_from_path(path: str) -> str:
+    """
+    Concurrent requests for the same path share a single request to the PSS API.
+    """
     if path:
         path = path.strip('/')
+    request = __IN_FLIGHT_REQUESTS.get(path)
+    if request is None:
+        request = asyncio.ensure_future(__get_data_from_path(path))
+        __IN_FLIGHT_REQUESTS[path] = request
+        request.add_done_callback(lambda finished_request: __remove_in_flight_request(path, finished_request))
+    else:
+        util.dbg_prnt(f'[get_data_from_path] Joining in-flight request for path: {path}')
+    # Shield the shared request, so that a cancelled caller doesn't cancel it for everyone else.
+    return await asyncio.shield(request)
+
+
+async def __get_data_from_path(path: str) -> str:
     base_url = await get_base_url()
     url = f'{base_url}{path}'
     return await get_data_from_url(url)
 
 
-def xmltree_to_dict3(raw_text: str) -> dict:
-    root = convert_raw_xml_to_dict(raw_text)
+def __remove_in_flight_request(path: str, request: asyncio.Future) -> None:
+    if __IN_FLIGHT_REQUESTS.get(path) is request:
+        __IN_FLIGHT_REQUESTS.pop(path)
+    if not request.cancelled():
+        # Mark a possible exception as retrieved, in case all callers got cancelled.
+        request.exception()
+
+
+async def get_wikia_link(page_name: str) -> str:
+    page_name = '_'.join([part for part in page_name.split(' ')])
+    page_name = '_'.join([part.lower().capitalize() for part in page_name.split('_')])
+    result = f'{settings.WIKIA_BASE_ADDRESS}{page_name}'
+
+    if not (await check_hyperlink(result)):
+        page_name_split = page_name.split('_')
+        if len(page_name_split) > 1:
+            page_name = f'{page_name_split[0].upper()}_{"_".join(page_name_split[1:])}'
+        else:
+            page_name = page_name.upper()
+    result = f'{settings.WIKIA_BASE_ADDRESS}{page_name}'
+
+    if not (await check_hyperlink(result)):
+        result = ''
+
+    return result
+
+
+async def check_hyperlink(hyperlink: str) -> bool:
+    if hyperlink:
+        session = get_http_session()
+        response: aiohttp.ClientResponse
+        async with session.get(hyperlink) as response:
+            return response.status == 200
+    else:
+        return False
+
+
+async def xmltree_to_dict3_async(raw_text: str) -> dict:
+    """
+    Returns the same dict as xmltree_to_dict3(). Payloads exceeding settings.XML_PARSE_OFFLOAD_THRESHOLD characters get parsed in an executor, so that the event loop doesn't get blocked while parsing.
+    """
+    executor = get_xml_parse_executor()
+    if executor is None or len(raw_text) < settings.XML_PARSE_OFFLOAD_THRESHOLD:
+        return xmltree_to_dict3(raw_text)
+
+    try:
+        result = await asyncio.get_event_loop().run_in_executor(executor, xmltree_to_dict3, raw_text)
+        if isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+            # Unpickled strings aren't interned anymore
+            result = _intern_dict(result)
+        return result
+    except BrokenProcessPool as error:
+        # The process executor won't be recreated, so that the bot doesn't get forked while running.
+        print(f'[xmltree_to_dict3_async] {error.__class__.__name__} occurred while parsing in the executor. Parsing on the event loop from now on: {error}')
+        shutdown_xml_parse_executor()
+    return xmltree_to_dict3(raw_text)
+
+
+def get_xml_parse_executor() -> concurrent.futures.Executor:
+    """
+    Returns the executor configured in settings.XML_PARSE_EXECUTOR_TYPE ('thread', 'process' or 'none') or None, if parsing shouldn't be offloaded. A thread executor gets created lazily. A process executor has to be started via start_xml_parse_executor().
+    """
+    global __xml_parse_executor
+    if __xml_parse_executor is None and settings.XML_PARSE_EXECUTOR_TYPE.lower() == 'thread':
+        __xml_parse_executor = concurrent.futures.ThreadPoolExecutor(max_workers=settings.XML_PARSE_EXECUTOR_WORKERS)
+    return __xml_parse_executor
+
+
+def start_xml_parse_executor() -> None:
+    """
+    Creates the executor configured in settings.XML_PARSE_EXECUTOR_TYPE. The worker processes of a process executor get forked immediately and inherit everything this process holds at that time, so this has to be called before the bot gets started (see init_xml_parsing()).
+    """
+    global __xml_parse_executor
+    if __xml_parse_executor is None and settings.XML_PARSE_EXECUTOR_TYPE.lower() == 'process':
+        # The worker processes get forked and thus use the parser backend selected in this process. They only get forked on the first submit, so submit a no-op now.
+        __xml_parse_executor = concurrent.futures.ProcessPoolExecutor(max_workers=settings.XML_PARSE_EXECUTOR_WORKERS)
+        __xml_parse_executor.submit(int).result()
+    get_xml_parse_executor()
+
+
+def shutdown_xml_parse_executor() -> None:
+    global __xml_parse_executor
+    if __xml_parse_executor is not None:
+        __xml_parse_executor.shutdown(wait=False)
+        __xml_parse_executor = None
+
+
+def xmltree_to_dict3(raw_text: str, backend: XmlParserBackend = None) -> dict:
+    backend = backend or __xml_parser_backend
+    result = _stream_xml_to_dict3(raw_text, backend=backend)
+    if result is not None:
+        return result
+
+    root = convert_raw_xml_to_dict(raw_text, backend=backend)
     for c in root.values():
         if isinstance(c, dict):
             for cc in c.values():
@@ -77,8 +317,86 @@ def xmltree_to_dict2(raw_text: str) -> dict:
     return {}
 
 
-def convert_raw_xml_to_dict(raw_xml: str, include_root: bool = True) -> dict:
-    root = xml.etree.ElementTree.fromstring(raw_xml)
+def _stream_xml_to_dict3(raw_text: str, backend: XmlParserBackend = None) -> dict:
+    """
+    Returns the same dict as xmltree_to_dict3(), but parses the raw xml incrementally and only converts the elements of the first container at depth 2. Parsing stops after that container has been read and converted elements get removed from the tree.
+    Returns None, if the xml has a structure, for which the result might differ from xmltree_to_dict3(), e.g. if elements at depth 1 share the same tag.
+    The backend is resolved once, so a backend selected while parsing won't be used for the remaining chunks. Uses the selected backend, if backend is not specified.
+    """
+    backend = backend or __xml_parser_backend
+    parser = backend.create_pull_parser()
+    depth: int = 0
+    root: xml.etree.ElementTree.Element = None
+    depth_1_element: xml.etree.ElementTree.Element = None
+    depth_1_tags: Set[str] = set()
+    container: xml.etree.ElementTree.Element = None
+    result: dict = None
+    children: List[Tuple[str, str, dict]] = []
+
+    for position in range(0, len(raw_text), __XML_STREAM_CHUNK_SIZE):
+        parser.feed(backend.prepare_text(raw_text[position:position + __XML_STREAM_CHUNK_SIZE]))
+        for event, element in parser.read_events():
+            if event == 'start':
+                if depth == 0:
+                    root = element
+                elif depth == 1:
+                    # Siblings with the same key get dropped by _convert_xml_to_dict()
+                    if element.tag in depth_1_tags or element.tag in root.attrib:
+                        return None
+                    depth_1_tags.add(element.tag)
+                    depth_1_element = element
+                elif depth == 2 and container is None:
+                    # The first element at depth 2 is the container, because parsing stops at its end.
+                    if element.tag in depth_1_element.attrib:
+                        return None
+                    container = element
+                    result = _fix_attrib(element.attrib) if element.attrib else {}
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 3 and container is not None:
+                    children.append(__convert_child_xml_to_dict(element))
+                    container.remove(element)
+                elif element is container:
+                    __add_children_to_dict(result, children)
+                    return result
+                elif depth == 1:
+                    element.clear()
+
+    parser.close()
+    return {}
+
+
+def __add_children_to_dict(result: dict, children: List[Tuple[str, str, dict]]) -> None:
+    """
+    Adds the converted children to the result. Children with a tag occuring only once are keyed by their tag. Children with a tag occuring multiple times are keyed by their id key, if there's an id key extractor for that tag. If multiple children have the same key, only the first one will be added.
+    """
+    tag_count = {}
+    for tag, _, _ in children:
+        tag_count[tag] = tag_count.get(tag, 0) + 1
+
+    for tag, id_key, child_dict in children:
+        key = None
+        if tag_count[tag] > 1 and tag in __ID_KEY_EXTRACTORS.keys():
+            if id_key is None:
+                raise KeyError(', '.join(data.ID_NAMES_INFO[tag]))
+            key = id_key
+
+        if not key:
+            key = tag
+
+        if key not in result.keys():
+            result[key] = child_dict
+
+
+def __convert_child_xml_to_dict(child: xml.etree.ElementTree.Element) -> Tuple[str, str, dict]:
+    get_id_key = __ID_KEY_EXTRACTORS.get(child.tag, None)
+    id_key = get_id_key(child.attrib) if get_id_key else None
+    return (child.tag, id_key, _convert_xml_to_dict(child, False))
+
+
+def convert_raw_xml_to_dict(raw_xml: str, include_root: bool = True, backend: XmlParserBackend = None) -> dict:
+    root = (backend or __xml_parser_backend).fromstring(raw_xml)
     # Create an empty dictionary
     result = _convert_xml_to_dict(root, include_root)
     return result
@@ -88,82 +406,71 @@ def _convert_xml_to_dict(root: xml.etree.ElementTree.Element, include_root: bool
     if root is None:
         return None
 
-    result = {}
-    if root.attrib:
-        if include_root:
-            result[root.tag] = _fix_attrib(root.attrib)
-        else:
-            result = _fix_attrib(root.attrib)
-    elif include_root:
-        result[root.tag] = {}
+    result = _fix_attrib(root.attrib) if root.attrib else {}
 
-    # Retrieve all distinct names of sub tags
-    tag_count = _get_child_tag_count(root)
-
-    for child in root:
-        tag = child.tag
-        key = None
-        if tag_count[tag] < 1:
-            continue
-        elif tag_count[tag] > 1:
-            if tag in data.ID_NAMES_INFO.keys():
-                id_attr_names = data.ID_NAMES_INFO[tag]
-                if id_attr_names:
-                    key = ''
-                    id_attr_values = []
-                    for id_attr_name in id_attr_names:
-                        id_attr_values.append(child.attrib[id_attr_name])
-                    id_attr_values = sorted(id_attr_values)
-                    key = '.'.join(id_attr_values)
+    # Comments and processing instructions parsed by lxml don't have a str tag
+    children = [__convert_child_xml_to_dict(child) for child in root if isinstance(child.tag, str)]
+    if children:
+        __add_children_to_dict(result, children)
 
-        if not key:
-            key = tag
+    if include_root:
+        return {root.tag: result}
+    else:
+        return result
 
-        child_dict = _convert_xml_to_dict(child, False)
-        if include_root:
-            if key not in result[root.tag].keys():
-                result[root.tag][key] = child_dict
-        else:
-            if key not in result.keys():
-                result[key] = child_dict
 
-    return result
+def __create_id_key_extractor(id_attr_names: List[str]) -> Callable[[Dict[str, str]], str]:
+    """
+    Returns a function retrieving the key of an element from its attributes: the sorted values of the id attributes joined by '.'. The function returns None, if an id attribute is missing.
+    """
+    if len(id_attr_names) == 1:
+        id_attr_name = id_attr_names[0]
+        return lambda attrib: attrib.get(id_attr_name, None)
 
+    def get_id_key(attrib: Dict[str, str]) -> str:
+        id_attr_values = [attrib.get(id_attr_name, None) for id_attr_name in id_attr_names]
+        if None in id_attr_values:
+            return None
+        return '.'.join(sorted(id_attr_values))
 
-def _get_child_tag_count(root: xml.etree.ElementTree.Element) -> dict:
-    if root is None:
-        return None
+    return get_id_key
 
-    child_tags = list(set([child_node.tag for child_node in root]))
-    result = {}
-    for child_tag in child_tags:
-        result[child_tag] = sum(1 for child_node in root if child_node.tag == child_tag)
 
-    return result
+__ID_KEY_EXTRACTORS: Dict[str, Callable[[Dict[str, str]], str]] = {tag: __create_id_key_extractor(id_attr_names) for tag, id_attr_names in data.ID_NAMES_INFO.items() if id_attr_names}
 
 
 def _fix_attrib(attrib: dict) -> dict:
     if not attrib:
         return None
 
-    result = {}
-
-    for (key, value) in attrib.items():
-        if key.endswith('Xml') and value:
-            raw_xml = value
-            #raw_xml = html.unescape(value)
-            fixed_value = convert_raw_xml_to_dict(raw_xml)
-            result[key[:-3]] = fixed_value
+    # Attribute names and enum-like values repeat across all entities, so only one copy of each should be kept in memory.
+    result = XmlAttribDict(zip(map(sys.intern, attrib.keys()), attrib.values()))
+    for property_name in settings.XML_INTERNED_VALUE_PROPERTY_NAMES:
+        value = dict.get(result, property_name, None)
+        if value:
+            result[property_name] = sys.intern(value)
+    return result
 
-        result[key] = value
 
+def _intern_dict(value: object) -> object:
+    """
+    Returns a copy of a dict created by _convert_xml_to_dict() with the keys and enum-like values interned like _fix_attrib() does.
+    """
+    if not isinstance(value, dict):
+        return value
+    # dict.items() doesn't decode nested xml of an XmlAttribDict
+    result = value.__class__((sys.intern(key), _intern_dict(item)) for key, item in dict.items(value))
+    for property_name in settings.XML_INTERNED_VALUE_PROPERTY_NAMES:
+        property_value = dict.get(result, property_name, None)
+        if property_value and isinstance(property_value, str):
+            result[property_name] = sys.intern(property_value)
     return result
 
 
 __rx_property_fix_replace = re.compile(r'[^a-z0-9]', re.IGNORECASE)
 __rx_allowed_candidate_fix_replace = re.compile(r'(\(.*?\)|[^a-z0-9 ])', re.IGNORECASE)
 
-def _fix_property_value(property_value: str) -> str:
+def fix_property_value(property_value: str) -> str:
     result = property_value.lower()
     result = result.strip()
     result = __rx_property_fix_replace.sub('', result)
@@ -176,39 +483,118 @@ def fix_allowed_value_candidate(candidate: str) -> str:
     return result
 
 
-def get_ids_from_property_value(data: dict, property_name: str, property_value: str, fix_data_delegate: Callable = None, match_exact: bool = False) -> list:
+def get_ids_from_property_value(data: dict, property_name: str, property_value: str, fix_data_delegate: Callable = None, match_exact: bool = False, limit: int = None) -> list:
     # data structure: {id: content}
-    # fixed_data structure: {description: id}
     if not data or not property_name or not property_value:
         print(f'- get_ids_from_property_value: invalid data or property info. Return empty list.')
         return []
 
     if not fix_data_delegate:
-        fix_data_delegate = _fix_property_value
+        fix_data_delegate = fix_property_value
 
+    # Building a full index only pays off, if it gets reused, so for a single lookup only index the entries containing the value.
     fixed_value = fix_data_delegate(property_value)
-    fixed_data = {entry_id: fix_data_delegate(entry_data[property_name]) for entry_id, entry_data in data.items() if entry_data[property_name]}
-
-    similarity_map = {}
-    for entry_id, entry_property in fixed_data.items():
-        if entry_property.startswith(fixed_value) or fixed_value in entry_property:
-            similarity_value = util.get_similarity(entry_property, fixed_value)
-            if similarity_value in similarity_map.keys():
-                similarity_map[similarity_value].append((entry_id, entry_property))
-            else:
-                similarity_map[similarity_value] = [(entry_id, entry_property)]
-    for similarity_value, entries in similarity_map.items():
-        similarity_map[similarity_value] = sorted(entries, key=lambda entry: entry[1])
-    similarity_values = sorted(list(similarity_map.keys()), reverse=True)
-    results = []
-    for similarity_value in similarity_values:
-        if not match_exact or (match_exact is True and similarity_value.is_integer()):
-            entry_ids = [entry_id for (entry_id, _) in similarity_map[similarity_value]]
-            results.extend(entry_ids)
+    index = {}
+    for entry_id, entry_data in data.items():
+        entry_property = entry_data[property_name]
+        if entry_property:
+            fixed_property = fix_data_delegate(entry_property)
+            if fixed_value in fixed_property:
+                index.setdefault(fixed_property, []).append(entry_id)
+    ids_by_value = {fixed_property: index[fixed_property] for fixed_property in sorted(index.keys())}
+    property_value_index = PropertyValueIndex(ids_by_value, None)
+    results = get_ids_from_property_value_index(property_value_index, property_value, fix_data_delegate=fix_data_delegate, match_exact=match_exact, limit=limit)
+    return results
+
+
+def create_property_value_index(data: dict, property_name: str, fix_data_delegate: Callable = None) -> PropertyValueIndex:
+    """
+    Returns an index over the fixed values of the specified property:
+    - ids_by_value maps the fixed values to the ids of the entries having that value. It is sorted by the fixed values and the ids are kept in the order of the data.
+    - values_by_ngram is an inverted index mapping n-grams to the fixed values containing them. It may be None, in which case all values will be considered candidates.
+    """
+    # data structure: {id: content}
+    # ids_by_value structure: {fixed description: [id]}
+    # values_by_ngram structure: {ngram: {fixed description}}
+    if not fix_data_delegate:
+        fix_data_delegate = fix_property_value
+
+    index = {}
+    for entry_id, entry_data in data.items():
+        entry_property = entry_data[property_name]
+        if entry_property:
+            index.setdefault(fix_data_delegate(entry_property), []).append(entry_id)
+    ids_by_value = {fixed_property: index[fixed_property] for fixed_property in sorted(index.keys())}
+
+    values_by_ngram = {}
+    for fixed_property in ids_by_value.keys():
+        for ngram in _get_ngrams(fixed_property):
+            values_by_ngram.setdefault(ngram, set()).add(fixed_property)
+
+    return PropertyValueIndex(ids_by_value, values_by_ngram)
 
+
+def get_ids_from_property_value_index(property_value_index: PropertyValueIndex, property_value: str, fix_data_delegate: Callable = None, match_exact: bool = False, limit: int = None) -> list:
+    """
+    Looks up the property value in an index created by create_property_value_index(). Returns the ids of the matching entries, best matches first.
+    If limit is specified, only the best matches will be ranked and at most that many ids will be returned.
+    """
+    if not property_value_index or not property_value or (limit is not None and limit < 1):
+        return []
+
+    if not fix_data_delegate:
+        fix_data_delegate = fix_property_value
+
+    fixed_value = fix_data_delegate(property_value)
+    candidates = [fixed_property for fixed_property in _get_candidate_property_values(property_value_index, fixed_value) if fixed_value in fixed_property]
+    similarity_values = [util.get_similarity(fixed_property, fixed_value) for fixed_property in candidates]
+    matches = [(similarity_value, fixed_property) for similarity_value, fixed_property in zip(similarity_values, candidates) if not match_exact or similarity_value.is_integer()]
+
+    # The candidates are sorted by the fixed property values and both sorted() and heapq.nsmallest() are stable, so matches with the same similarity stay sorted by value.
+    if limit is None:
+        matches = sorted(matches, key=__get_match_sort_key)
+    else:
+        # Every fixed property value maps to at least one id, so the best [limit] matches yield enough ids.
+        matches = heapq.nsmallest(limit, matches, key=__get_match_sort_key)
+    results = []
+    for _, fixed_property in matches:
+        results.extend(property_value_index.ids_by_value[fixed_property])
+    if limit is not None:
+        results = results[:limit]
     return results
 
 
+def __get_match_sort_key(match: Tuple[float, str]) -> float:
+    return -match[0]
+
+
+def _get_candidate_property_values(property_value_index: PropertyValueIndex, fixed_value: str) -> Iterable[str]:
+    """
+    Returns the sorted fixed property values sharing all n-grams with the fixed value. If the index has no n-grams or the fixed value is too short to have n-grams, all fixed property values will be returned.
+    """
+    if property_value_index.values_by_ngram is None:
+        return property_value_index.ids_by_value.keys()
+    ngrams = _get_ngrams(fixed_value)
+    if not ngrams:
+        return property_value_index.ids_by_value.keys()
+
+    values_by_ngram = property_value_index.values_by_ngram
+    candidates: Set[str] = None
+    # Start with the rarest n-gram to keep the intersections small.
+    for ngram in sorted(ngrams, key=lambda ngram: len(values_by_ngram.get(ngram, ()))):
+        values = values_by_ngram.get(ngram)
+        if not values:
+            return []
+        candidates = values if candidates is None else candidates.intersection(values)
+        if not candidates:
+            return []
+    return sorted(candidates)
+
+
+def _get_ngrams(value: str) -> Set[str]:
+    return {value[i:i + PROPERTY_VALUE_NGRAM_LENGTH] for i in range(len(value) - PROPERTY_VALUE_NGRAM_LENGTH + 1)}
+
+
 def filter_data_list(data: list, by: dict, ignore_case: bool = False) -> list:
     """Parameter 'data':
        - A list of entity dicts
@@ -339,6 +725,12 @@ def convert_iap_options_mask(iap_options_mask: int) -> str:
 
 # ---------- Get Production Server ----------
 
+__production_server: str = None
+__production_server_modify_date: datetime = None
+__production_server_lock: asyncio.Lock = None
+__production_server_update_task: asyncio.Future = None
+
+
 async def get_latest_settings(language_key: str = 'en', use_default: bool = False) -> dict:
     if not language_key:
         language_key = 'en'
@@ -350,8 +742,11 @@ async def get_latest_settings(language_key: str = 'en', use_default: bool = Fals
 
 
 async def get_production_server(language_key: str = 'en') -> str:
-    latest_settings = await get_latest_settings(language_key=language_key, use_default=True)
-    return latest_settings['ProductionServer']
+    if __get_is_production_server_outdated():
+        async with __get_production_server_lock():
+            if __get_is_production_server_outdated():
+                await __update_production_server(language_key=language_key)
+    return __production_server
 
 
 async def get_base_url(use_default: bool = False) -> str:
@@ -363,6 +758,94 @@ async def get_base_url(use_default: bool = False) -> str:
     return result
 
 
+async def update_production_server(language_key: str = 'en') -> str:
+    async with __get_production_server_lock():
+        return await __update_production_server(language_key=language_key)
+
+
+async def __update_production_server(language_key: str = 'en') -> str:
+    """
+    Retrieves the current production server. If that fails, the last known production server will be kept. If there's none, the default production server will be used.
+    """
+    global __production_server
+    global __production_server_modify_date
+    production_server = None
+    try:
+        latest_settings = await get_latest_settings(language_key=language_key, use_default=True)
+        production_server = latest_settings['ProductionServer']
+    except asyncio.CancelledError:
+        raise
+    except Exception as error:
+        print(f'[update_production_server] {error.__class__.__name__} occurred while retrieving the production server: {error}')
+
+    if production_server:
+        __production_server = production_server
+    elif not __production_server:
+        __production_server = settings.DEFAULT_PRODUCTION_SERVER
+    __production_server_modify_date = util.get_utcnow()
+    util.dbg_prnt(f'[update_production_server] Production server is: {__production_server}')
+    return __production_server
+
+
+def __get_is_production_server_outdated() -> bool:
+    if __production_server is None or __production_server_modify_date is None:
+        return True
+    utc_now = util.get_utcnow()
+    return utc_now - __production_server_modify_date > settings.PRODUCTION_SERVER_CACHE_DURATION
+
+
+def __get_production_server_lock() -> asyncio.Lock:
+    global __production_server_lock
+    if __production_server_lock is None:
+        __production_server_lock = asyncio.Lock()
+    return __production_server_lock
+
+
+async def __production_server_update_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.PRODUCTION_SERVER_UPDATE_INTERVAL.total_seconds())
+        await update_production_server()
+
+
+def start_production_server_update_loop() -> None:
+    global __production_server_update_task
+    if __production_server_update_task is None or __production_server_update_task.done():
+        __production_server_update_task = asyncio.ensure_future(__production_server_update_loop())
+
+
+
+
+
+
+
+
+
+
+# ---------- HTTP ----------
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Returns the shared HTTP client. It will be created, if it doesn't exist yet or has been closed.
+    """
+    global HTTP_SESSION
+    if HTTP_SESSION is None or HTTP_SESSION.closed:
+        connector = aiohttp.TCPConnector(
+            limit=settings.HTTP_CONNECTION_LIMIT,
+            limit_per_host=settings.HTTP_CONNECTION_LIMIT_PER_HOST,
+            keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL
+        )
+        HTTP_SESSION = aiohttp.ClientSession(connector=connector)
+    return HTTP_SESSION
+
+
+async def close_http_session() -> None:
+    global HTTP_SESSION
+    if HTTP_SESSION is not None and not HTTP_SESSION.closed:
+        await HTTP_SESSION.close()
+    HTTP_SESSION = None
+
+
 
 
 
@@ -456,6 +939,9 @@ async def init_db():
     if not (await db_update_schema('1.2.8.0', db_update_schema_v_1_2_8_0)):
         return
 
+    if not (await db_update_schema('1.2.9.0', db_update_schema_v_1_2_9_0)):
+        return
+
     success_serversettings = await db_try_create_table('serversettings', [
         ('guildid', 'TEXT', True, True),
         ('dailychannelid', 'TEXT', False, False),
@@ -481,6 +967,30 @@ async def db_update_schema(version: str, update_function: Callable) -> bool:
     return success
 
 
+async def db_update_schema_v_1_2_9_0() -> bool:
+    column_definitions_cache_snapshots = [
+        ('cachename', 'TEXT', True, True),
+        ('modifydate', 'TIMESTAMPTZ', False, True),
+        ('data', 'BYTEA', False, False)
+    ]
+
+    schema_version = await db_get_schema_version()
+    if schema_version:
+        compare_1290 = util.compare_versions(schema_version, '1.2.9.0')
+        compare_1280 = util.compare_versions(schema_version, '1.2.8.0')
+        if compare_1290 <= 0:
+            return True
+        elif compare_1280 > 0:
+            return False
+
+    print(f'[db_update_schema_v_1_2_9_0] Updating database schema from v1.2.8.0 to v1.2.9.0')
+
+    success = await db_try_create_table('cachesnapshots', column_definitions_cache_snapshots)
+    if success:
+        success = await db_try_set_schema_version('1.2.9.0')
+    return success
+
+
 async def db_update_schema_v_1_2_8_0() -> bool:
     column_definitions_serversettings = [
         ('guildid', 'BIGINT', True, True),
@@ -957,6 +1467,26 @@ def print_db_query_error(function_name: str, query: str, args: list, error: asyn
 
 # ---------- Initialization ----------
 
+def init_xml_parsing():
+    """
+    Selects the xml parser backend and starts the xml parse executor. Must be called before bot.run(), so that worker processes get forked before the Discord client opens its gateway connection and starts its threads.
+    """
+    xml_parser_backend = select_xml_parser_backend()
+    print(f'[init_xml_parsing] Using xml parser backend: {xml_parser_backend.name}')
+    start_xml_parse_executor()
+
+
 async def init():
     await db_connect()
-    await init_db()
\ No newline at end of file
+    await init_db()
+    get_http_session()
+    await update_production_server()
+    start_production_server_update_loop()
+
+
+async def shutdown():
+    if __production_server_update_task is not None and not __production_server_update_task.done():
+        __production_server_update_task.cancel()
+    shutdown_xml_parse_executor()
+    await close_http_session()
+    await db_disconnect()
\ No newline at end of file
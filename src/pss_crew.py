@@ -1,15 +1,21 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 
+import array
+import asyncio
+from collections import Counter
 import discord
+import heapq
+import math
 import os
-from typing import Dict, List, Set, Tuple, Union
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Union
 
-from cache import PssCache
+from cache import LruCache, PssCache
 import emojis
 import pss_assert
 import pss_entity as entity
 import pss_core as core
+import pss_exception
 import pss_lookups as lookups
 import settings
 import utility as util
@@ -25,6 +31,21 @@ COLLECTION_DESIGN_BASE_PATH = 'CollectionService/ListAllCollectionDesigns?langua
 COLLECTION_DESIGN_KEY_NAME = 'CollectionDesignId'
 COLLECTION_DESIGN_DESCRIPTION_PROPERTY_NAME = 'CollectionName'
 
+COLLECTION_CHARACTERS_INDEX_VIEW_NAME = 'collection_index'
+CREW_STAT_TABLE_VIEW_NAME = 'stat_table'
+# Maps the values of lookups.STAT_TYPES_LOOKUP to the properties of crew stats scaling with the level
+CREW_LEVELED_STAT_PROPERTY_NAMES: Dict[str, str] = {
+    'Ability': 'SpecialAbilityArgument',
+    'Attack': 'Attack',
+    'Engine': 'Engine',
+    'HP': 'Hp',
+    'Pilot': 'Pilot',
+    'Repair': 'Repair',
+    'Science': 'Science',
+    'Weapon': 'Weapon'
+}
+CREW_MAX_LEVEL = 40
+
 __PRESTIGE_FROM_BASE_PATH = f'CharacterService/PrestigeCharacterFrom?languagekey=en&characterDesignId='
 __PRESTIGE_TO_BASE_PATH = f'CharacterService/PrestigeCharacterTo?languagekey=en&characterDesignId='
 
@@ -32,8 +53,12 @@ __PRESTIGE_TO_BASE_PATH = f'CharacterService/PrestigeCharacterTo?languagekey=en&
 
 # ---------- Initilization ----------
 
-__prestige_from_cache_dict = {}
-__prestige_to_cache_dict = {}
+__prestige_graph: 'PrestigeGraph' = None
+__prestige_graph_task: asyncio.Future = None
+
+# Per-character caches are created on demand, so keep only the most recently used ones.
+__prestige_from_caches: LruCache = LruCache(settings.PRESTIGE_CACHE_MAX_SIZE, idle_ttl=settings.PRESTIGE_CACHE_IDLE_TTL)
+__prestige_to_caches: LruCache = LruCache(settings.PRESTIGE_CACHE_MAX_SIZE, idle_ttl=settings.PRESTIGE_CACHE_IDLE_TTL)
 
 
 
@@ -255,10 +280,223 @@ class LegacyPrestigeToDetails(LegacyPrestigeDetails):
 
 
 
+class CrewStatTable:
+    """
+    Holds the values of all stats scaling with the level for all characters at all levels in flat arrays of floats, one per stat. The value of a character at a level is stored at index (character index * CREW_MAX_LEVEL + level - 1). Values of characters with invalid stats are NaN.
+    """
+    def __init__(self, chars_designs_data: entity.EntitiesDesignsData):
+        self.__char_design_ids: List[str] = list(chars_designs_data.keys())
+        self.__char_indices: Dict[str, int] = {char_design_id: i for i, char_design_id in enumerate(self.__char_design_ids)}
+        level_factors_by_exponent = {
+            exponent: [((level - 1) / (CREW_MAX_LEVEL - 1)) ** exponent for level in range(1, CREW_MAX_LEVEL + 1)]
+            for exponent in set(lookups.PROGRESSION_TYPES.values())
+        }
+        invalid_values = [math.nan] * CREW_MAX_LEVEL
+        self.__values: Dict[str, array.array] = {}
+        for stat_name in set(CREW_LEVELED_STAT_PROPERTY_NAMES.values()):
+            max_stat_name = CrewStatTable.__get_max_stat_name(stat_name)
+            values = array.array('d')
+            for char_design_info in chars_designs_data.values():
+                level_factors = level_factors_by_exponent.get(lookups.PROGRESSION_TYPES.get(char_design_info.get('ProgressionType')))
+                try:
+                    min_value = float(char_design_info[stat_name])
+                    max_value = float(char_design_info[max_stat_name])
+                except (KeyError, TypeError, ValueError):
+                    level_factors = None
+                if level_factors is None:
+                    values.extend(invalid_values)
+                else:
+                    values.extend([min_value + (max_value - min_value) * level_factor for level_factor in level_factors])
+            self.__values[stat_name] = values
+
+
+    @property
+    def char_design_ids(self) -> List[str]:
+        return list(self.__char_design_ids)
+
+
+    def get_stat_value(self, char_design_id: str, stat_name: str, level: int) -> float:
+        """
+        Returns the value of a stat of a character at the given level or None, if the value is not known.
+        """
+        char_index = self.__char_indices.get(char_design_id)
+        values = self.__values.get(stat_name)
+        if char_index is None or values is None or level < 1 or level > CREW_MAX_LEVEL:
+            return None
+        result = values[char_index * CREW_MAX_LEVEL + level - 1]
+        if math.isnan(result):
+            return None
+        return result
+
+
+    def get_top_stat_values(self, stat_name: str, level: int, count: int) -> List[Tuple[str, float]]:
+        """
+        Returns the character design ids and stat values of the count characters with the highest values of a stat at the given level.
+        """
+        level_values = self.__values[stat_name][level - 1::CREW_MAX_LEVEL]
+        char_indices = [i for i, value in enumerate(level_values) if not math.isnan(value)]
+        top_char_indices = heapq.nlargest(count, char_indices, key=level_values.__getitem__)
+        result = [(self.__char_design_ids[i], level_values[i]) for i in top_char_indices]
+        return result
+
+
+    @staticmethod
+    def __get_max_stat_name(stat_name: str) -> str:
+        if stat_name.lower().startswith('specialability'):
+            return 'SpecialAbilityFinalArgument'
+        else:
+            return f'Final{stat_name}'
+
+
+
+
+
+
+
+
+
+
+class PrestigeGraph:
+    """
+    Holds all prestige recipes in memory. A recipe is a tuple of the two character design ids prestiged and the resulting character design id.
+    """
+    def __init__(self, recipes: Iterable[Tuple[str, str, str]], data_version: int):
+        self.__data_version: int = data_version
+        self.__recipes_by_to: Dict[str, List[Tuple[str, str]]] = {}
+        self.__recipes_by_from: Dict[str, List[Tuple[str, str]]] = {}
+        recipe_count = 0
+        # Sort the recipes, so that the search always explores them in the same order
+        for char_1_design_id, char_2_design_id, char_to_design_id in sorted(set(recipes)):
+            self.__recipes_by_to.setdefault(char_to_design_id, []).append((char_1_design_id, char_2_design_id))
+            self.__recipes_by_from.setdefault(char_1_design_id, []).append((char_2_design_id, char_to_design_id))
+            if char_2_design_id != char_1_design_id:
+                self.__recipes_by_from.setdefault(char_2_design_id, []).append((char_1_design_id, char_to_design_id))
+            recipe_count += 1
+        self.__recipe_count: int = recipe_count
+
+
+    @property
+    def data_version(self) -> int:
+        """
+        The data version of the characters designs this graph has been built for.
+        """
+        return self.__data_version
+
+    @property
+    def recipe_count(self) -> int:
+        return self.__recipe_count
+
+
+    def get_prestige_from_data(self, char_design_id: str) -> Dict[str, Dict[str, str]]:
+        """
+        Returns the prestige recipes the specified character is part of in the format of the PrestigeCharacterFrom endpoint.
+        """
+        result = {}
+        for char_2_design_id, char_to_design_id in self.__recipes_by_from.get(char_design_id, []):
+            result[f'{char_2_design_id}.{char_to_design_id}'] = {
+                'CharacterDesignId1': char_design_id,
+                'CharacterDesignId2': char_2_design_id,
+                'ToCharacterDesignId': char_to_design_id
+            }
+        return result
+
+
+    def get_prestige_to_data(self, char_design_id: str) -> Dict[str, Dict[str, str]]:
+        """
+        Returns the prestige recipes resulting in the specified character in the format of the PrestigeCharacterTo endpoint.
+        """
+        result = {}
+        for char_1_design_id, char_2_design_id in self.__recipes_by_to.get(char_design_id, []):
+            result[f'{char_1_design_id}.{char_2_design_id}'] = {
+                'CharacterDesignId1': char_1_design_id,
+                'CharacterDesignId2': char_2_design_id,
+                'ToCharacterDesignId': char_design_id
+            }
+        return result
+
+
+    def find_prestige_path(self, char_design_ids: List[str], char_to_design_id: str, max_steps: int, max_nodes: int) -> List[Tuple[str, str, str]]:
+        """
+        Searches for a sequence of prestiges turning the specified characters into the target character. Every character can only be used once, but may be specified multiple times. Returns the prestige steps in order or None, if no path with up to max_steps steps can be found within a search of max_nodes nodes.
+        """
+        available = Counter(char_design_ids)
+        if available[char_to_design_id] > 0:
+            return []
+        # The minimum number of prestige levels needed to get a character. Characters not reachable within max_steps levels are omitted.
+        levels = self.__get_prestige_levels(available, max_steps)
+        if char_to_design_id not in levels:
+            return None
+        search_state = {'remaining_nodes': max_nodes}
+        for steps, _ in self.__find_prestige_paths(char_to_design_id, available, max_steps, max_steps, levels, search_state):
+            return steps
+        return None
+
+
+    def __get_prestige_levels(self, available: Counter, max_levels: int) -> Dict[str, int]:
+        result = {char_design_id: 0 for char_design_id in available.keys()}
+        for level in range(1, max_levels + 1):
+            new_char_design_ids = {
+                char_to_design_id
+                for char_design_id in result.keys()
+                for char_2_design_id, char_to_design_id in self.__recipes_by_from.get(char_design_id, [])
+                if char_2_design_id in result and char_to_design_id not in result
+            }
+            if not new_char_design_ids:
+                break
+            for char_design_id in new_char_design_ids:
+                result[char_design_id] = level
+        return result
+
+
+    def __find_prestige_paths(self, char_design_id: str, available: Counter, max_level: int, max_steps: int, levels: Dict[str, int], search_state: dict) -> Iterator[Tuple[List[Tuple[str, str, str]], Counter]]:
+        """
+        Yields every way found to get the specified character from the available characters as a tuple of the prestige steps and the characters remaining. Ways leaving the same characters remaining are only yielded once.
+        """
+        search_state['remaining_nodes'] -= 1
+        if search_state['remaining_nodes'] < 0:
+            return
+        if available[char_design_id] > 0:
+            remaining = available.copy()
+            remaining[char_design_id] -= 1
+            yield ([], remaining)
+            # Prestiging a character that is available anyway would only use up more characters.
+            return
+        if max_level <= 0 or max_steps <= 0 or levels.get(char_design_id, max_level + 1) > max_level:
+            return
+
+        recipes = []
+        for char_1_design_id, char_2_design_id in self.__recipes_by_to.get(char_design_id, []):
+            if levels.get(char_1_design_id, max_level) < max_level and levels.get(char_2_design_id, max_level) < max_level:
+                recipes.append((char_1_design_id, char_2_design_id))
+                if char_2_design_id != char_1_design_id:
+                    recipes.append((char_2_design_id, char_1_design_id))
+        recipes.sort(key=lambda recipe: levels[recipe[0]] + levels[recipe[1]])
+
+        yielded_remainders = set()
+        for char_1_design_id, char_2_design_id in recipes:
+            # Every way to get the first character may leave different characters for the second one, so all of them need to be tried.
+            for steps_1, remaining_1 in self.__find_prestige_paths(char_1_design_id, available, max_level - 1, max_steps - 1, levels, search_state):
+                for steps_2, remaining_2 in self.__find_prestige_paths(char_2_design_id, remaining_1, max_level - 1, max_steps - 1 - len(steps_1), levels, search_state):
+                    remainder = frozenset((remaining_id, count) for remaining_id, count in remaining_2.items() if count > 0)
+                    if remainder not in yielded_remainders:
+                        yielded_remainders.add(remainder)
+                        yield (steps_1 + steps_2 + [(char_1_design_id, char_2_design_id, char_design_id)], remaining_2)
+                if search_state['remaining_nodes'] < 0:
+                    return
+
+
+
+
+
+
+
+
+
+
 # ---------- Helper functions ----------
 
-def __create_character_design_details_from_info(character_design_info: entity.EntityDesignInfo, characters_designs_data: entity.EntitiesDesignsData, collections_designs_data: entity.EntitiesDesignsData, level: int) -> entity.EntityDesignDetails:
-    return entity.EntityDesignDetails(character_design_info, __properties['title'], __properties['description'], __properties['character_long'], __properties['character_short'], __properties['character_long'], characters_designs_data, collections_designs_data, level=level)
+def __create_character_design_details_from_info(character_design_info: entity.EntityDesignInfo, characters_designs_data: entity.EntitiesDesignsData, collections_designs_data: entity.EntitiesDesignsData, level: int, crew_stat_table: CrewStatTable = None) -> entity.EntityDesignDetails:
+    return entity.EntityDesignDetails(character_design_info, __properties['title'], __properties['description'], __properties['character_long'], __properties['character_short'], __properties['character_long'], characters_designs_data, collections_designs_data, level=level, crew_stat_table=crew_stat_table)
 
 
 def __create_character_design_data_list_from_infos(character_design_infos: List[entity.EntityDesignInfo], characters_designs_data: entity.EntitiesDesignsData, collections_designs_data: entity.EntitiesDesignsData, level: int) -> List[entity.EntitiesDesignsData]:
@@ -275,7 +513,7 @@ def __calculate_stat_value(min_value: float, max_value: float, level: int, progr
 
 
 def __get_ability_stat(character_design_info: entity.EntityDesignInfo, characters_designs_data: entity.EntitiesDesignsData, collections_designs_data: entity.EntitiesDesignsData, level: int, **kwargs) -> str:
-    value = __get_stat(character_design_info, characters_designs_data, collections_designs_data, level, stat_name='SpecialAbilityArgument')
+    value = __get_stat(character_design_info, characters_designs_data, collections_designs_data, level, stat_name='SpecialAbilityArgument', **kwargs)
     special_ability = lookups.SPECIAL_ABILITIES_LOOKUP.get(character_design_info['SpecialAbilityType'], character_design_info['SpecialAbilityType'])
     if special_ability:
         result = f'{value} ({special_ability})'
@@ -314,7 +552,12 @@ def __get_speed(character_design_info: entity.EntityDesignInfo, characters_desig
     return result
 
 
-def __get_stat(character_design_info: entity.EntityDesignInfo, characters_designs_data: entity.EntitiesDesignsData, collections_designs_data: entity.EntitiesDesignsData, level: int, stat_name: str, **kwargs) -> str:
+def __get_stat(character_design_info: entity.EntityDesignInfo, characters_designs_data: entity.EntitiesDesignsData, collections_designs_data: entity.EntitiesDesignsData, level: int, stat_name: str, crew_stat_table: CrewStatTable = None, **kwargs) -> str:
+    # The stat table holds the stats of all characters at all levels already calculated
+    if crew_stat_table is not None and level is not None:
+        value = crew_stat_table.get_stat_value(character_design_info[CHARACTER_DESIGN_KEY_NAME], stat_name, level)
+        if value is not None:
+            return f'{value:0.1f}'
     is_special_stat = stat_name.lower().startswith('specialability')
     if is_special_stat:
         max_stat_name = 'SpecialAbilityFinalArgument'
@@ -343,10 +586,20 @@ def __get_stat_value(min_value: float, max_value: float, level: int, progression
 
 async def _get_collection_chars_designs_infos(collection_design_info: Dict[str, str]) -> list:
     collection_id = collection_design_info[COLLECTION_DESIGN_KEY_NAME]
-    chars_designs_data = await characters_designs_retriever.get_data_dict3()
-    chars_designs_infos = [chars_designs_data[char_id] for char_id in chars_designs_data.keys() if chars_designs_data[char_id][COLLECTION_DESIGN_KEY_NAME] == collection_id]
-    result = [char_design_info[CHARACTER_DESIGN_DESCRIPTION_PROPERTY_NAME] for char_design_info in chars_designs_infos]
-    result.sort()
+    collection_characters_index = await characters_designs_retriever.get_view(COLLECTION_CHARACTERS_INDEX_VIEW_NAME)
+    result = list(collection_characters_index.get(collection_id, []))
+    return result
+
+
+def _create_collection_characters_index(chars_designs_data: entity.EntitiesDesignsData) -> Dict[str, List[str]]:
+    """
+    Returns the sorted names of the characters of each collection by collection design id.
+    """
+    result = {}
+    for char_design_info in chars_designs_data.values():
+        result.setdefault(char_design_info.get(COLLECTION_DESIGN_KEY_NAME), []).append(char_design_info[CHARACTER_DESIGN_DESCRIPTION_PROPERTY_NAME])
+    for chars_names in result.values():
+        chars_names.sort()
     return result
 
 
@@ -378,7 +631,8 @@ async def get_char_design_details_by_name(char_name: str, level: int, as_embed:
         return [f'Could not find a crew named **{char_name}**.'], False
     else:
         collections_designs_data = await collections_designs_retriever.get_data_dict3()
-        character_design_details = __create_character_design_details_from_info(char_design_info, None, collections_designs_data, level)
+        crew_stat_table = await characters_designs_retriever.get_view(CREW_STAT_TABLE_VIEW_NAME)
+        character_design_details = __create_character_design_details_from_info(char_design_info, None, collections_designs_data, level, crew_stat_table=crew_stat_table)
         if as_embed:
             return character_design_details.get_details_as_embed(), True
         else:
@@ -420,6 +674,39 @@ async def get_collection_design_details_by_name(collection_name: str, as_embed:
 
 
 
+# ---------- Top crew Info ----------
+
+async def get_top_crew_by_stat(stat: str, level: int = CREW_MAX_LEVEL, count: int = 10, as_embed: bool = settings.USE_EMBEDS):
+    allowed_stats = [stat_name for stat_name, stat_type in lookups.STAT_TYPES_LOOKUP.items() if stat_type in CREW_LEVELED_STAT_PROPERTY_NAMES.keys()]
+    stat_type = lookups.STAT_TYPES_LOOKUP.get(stat.lower()) if stat else None
+    if stat_type not in CREW_LEVELED_STAT_PROPERTY_NAMES.keys():
+        raise pss_exception.InvalidParameter(parameter_name='stat', invalid_value=stat, valid_values=allowed_stats)
+    pss_assert.parameter_is_valid_integer(level, 'level', min_value=1, max_value=CREW_MAX_LEVEL)
+    pss_assert.parameter_is_valid_integer(count, 'count', min_value=1, max_value=settings.TOP_CREW_MAX_COUNT)
+
+    chars_designs_data = await characters_designs_retriever.get_data_dict3()
+    crew_stat_table: CrewStatTable = await characters_designs_retriever.get_view(CREW_STAT_TABLE_VIEW_NAME)
+    top_stat_values = crew_stat_table.get_top_stat_values(CREW_LEVELED_STAT_PROPERTY_NAMES[stat_type], level, count)
+
+    lines = [f'Top {len(top_stat_values)} crew by **{stat_type}** at level **{level}**:']
+    for i, (char_design_id, value) in enumerate(top_stat_values, 1):
+        char_design_info = chars_designs_data[char_design_id]
+        lines.append(f'{i}. **{char_design_info[CHARACTER_DESIGN_DESCRIPTION_PROPERTY_NAME]}** ({char_design_info["Rarity"]}): {value:0.1f}')
+
+    if as_embed:
+        return util.create_embed(lines[0], description='\n'.join(lines[1:])), True
+    else:
+        return lines, True
+
+
+
+
+
+
+
+
+
+
 # ---------- Prestige from Info ----------
 
 async def get_prestige_from_info(char_name: str, as_embed: bool = settings.USE_EMBEDS):
@@ -445,16 +732,17 @@ async def _get_prestige_from_data(char_design_info: dict) -> dict:
         return {}
 
     char_design_id = char_design_info[CHARACTER_DESIGN_KEY_NAME]
-    if char_design_id in __prestige_from_cache_dict.keys():
-        prestige_from_cache = __prestige_from_cache_dict[char_design_id]
-    else:
+    if __prestige_graph is not None:
+        return __prestige_graph.get_prestige_from_data(char_design_id)
+    prestige_from_cache = __prestige_from_caches.get(char_design_id)
+    if prestige_from_cache is None:
         prestige_from_cache = _create_and_add_prestige_from_cache(char_design_id)
     return await prestige_from_cache.get_data_dict3()
 
 
 def _create_and_add_prestige_from_cache(char_design_id: str) -> PssCache:
     cache = _create_prestige_from_cache(char_design_id)
-    __prestige_from_cache_dict[char_design_id] = cache
+    __prestige_from_caches.set(char_design_id, cache)
     return cache
 
 
@@ -498,16 +786,17 @@ async def _get_prestige_to_data(char_design_info: dict) -> dict:
         return {}
 
     char_design_id = char_design_info[CHARACTER_DESIGN_KEY_NAME]
-    if char_design_id in __prestige_to_cache_dict.keys():
-        prestige_to_cache = __prestige_to_cache_dict[char_design_id]
-    else:
+    if __prestige_graph is not None:
+        return __prestige_graph.get_prestige_to_data(char_design_id)
+    prestige_to_cache = __prestige_to_caches.get(char_design_id)
+    if prestige_to_cache is None:
         prestige_to_cache = _create_and_add_prestige_to_cache(char_design_id)
     return await prestige_to_cache.get_data_dict3()
 
 
 def _create_and_add_prestige_to_cache(char_design_id: str) -> PssCache:
     cache = _create_prestige_to_cache(char_design_id)
-    __prestige_to_cache_dict[char_design_id] = cache
+    __prestige_to_caches.set(char_design_id, cache)
     return cache
 
 
@@ -526,6 +815,146 @@ def _create_prestige_to_cache(char_design_id: str) -> PssCache:
 
 
 
+# ---------- Prestige caches ----------
+
+def get_prestige_caches() -> List[PssCache]:
+    return __prestige_to_caches.values() + __prestige_from_caches.values()
+
+
+def get_prestige_caches_stats_as_text() -> List[str]:
+    result = [
+        f'PrestigeTo: {__prestige_to_caches.get_stats_as_text()}',
+        f'PrestigeFrom: {__prestige_from_caches.get_stats_as_text()}'
+    ]
+    return result
+
+
+
+
+
+
+
+
+
+
+# ---------- Prestige path Info ----------
+
+async def get_prestige_path_info(char_names: List[str], char_to_name: str, as_embed: bool = settings.USE_EMBEDS):
+    for char_name in char_names:
+        pss_assert.valid_entity_name(char_name, 'char_name', min_length=2)
+    pss_assert.valid_entity_name(char_to_name, 'char_to_name', min_length=2)
+
+    if __prestige_graph is None:
+        return ['The prestige path search is not available at the moment.'], False
+
+    chars_designs_data = await characters_designs_retriever.get_data_dict3()
+    char_design_ids = []
+    for char_name in char_names:
+        char_design_info = await characters_designs_retriever.get_entity_design_info_by_name(char_name, chars_designs_data)
+        if not char_design_info:
+            return [f'Could not find a crew named **{char_name}**.'], False
+        char_design_ids.append(char_design_info[CHARACTER_DESIGN_KEY_NAME])
+    char_to_design_info = await characters_designs_retriever.get_entity_design_info_by_name(char_to_name, chars_designs_data)
+    if not char_to_design_info:
+        return [f'Could not find a crew named **{char_to_name}**.'], False
+
+    prestige_path = __prestige_graph.find_prestige_path(char_design_ids, char_to_design_info[CHARACTER_DESIGN_KEY_NAME], settings.PRESTIGE_PATH_MAX_STEPS, settings.PRESTIGE_PATH_MAX_SEARCH_NODES)
+    chars_names = ', '.join([f'**{chars_designs_data[char_design_id][CHARACTER_DESIGN_DESCRIPTION_PROPERTY_NAME]}**' for char_design_id in char_design_ids])
+    char_to_name = char_to_design_info[CHARACTER_DESIGN_DESCRIPTION_PROPERTY_NAME]
+    if prestige_path is None:
+        return [f'Could not find a way to prestige {chars_names} into **{char_to_name}** within {settings.PRESTIGE_PATH_MAX_STEPS} steps.'], False
+
+    lines = [f'Prestige {chars_names} into **{char_to_name}** in {len(prestige_path)} step(s):']
+    for i, (char_1_design_id, char_2_design_id, step_to_design_id) in enumerate(prestige_path, 1):
+        char_1_name = chars_designs_data[char_1_design_id][CHARACTER_DESIGN_DESCRIPTION_PROPERTY_NAME]
+        char_2_name = chars_designs_data[char_2_design_id][CHARACTER_DESIGN_DESCRIPTION_PROPERTY_NAME]
+        step_to_name = chars_designs_data[step_to_design_id][CHARACTER_DESIGN_DESCRIPTION_PROPERTY_NAME]
+        lines.append(f'{i}. **{char_1_name}** + **{char_2_name}** > **{step_to_name}**')
+
+    if as_embed:
+        return util.create_embed(lines[0], description='\n'.join(lines[1:])), True
+    else:
+        return lines, True
+
+
+
+
+
+
+
+
+
+
+# ---------- Prestige graph ----------
+
+def get_prestige_graph() -> PrestigeGraph:
+    return __prestige_graph
+
+
+async def update_prestige_graph() -> bool:
+    """
+    Retrieves the prestige recipes of all characters with bounded concurrency and replaces the prestige graph, if all of them could be retrieved. Returns True, if the graph has been replaced.
+    """
+    global __prestige_graph
+    chars_designs_data = await characters_designs_retriever.get_data_dict3()
+    data_version = characters_designs_retriever.data_version
+    # Neither Common nor Special crew can be prestiged into.
+    char_design_ids = [char_design_id for char_design_id, char_design_info in chars_designs_data.items() if char_design_info.get('Rarity') not in ('Common', 'Special')]
+    semaphore = asyncio.Semaphore(settings.PRESTIGE_GRAPH_LOAD_CONCURRENCY)
+
+    async def get_prestige_to_recipes(char_design_id: str) -> List[Tuple[str, str, str]]:
+        async with semaphore:
+            raw_data = await core.get_data_from_path(f'{__PRESTIGE_TO_BASE_PATH}{char_design_id}')
+            prestige_to_data = await core.xmltree_to_dict3_async(raw_data)
+        return [(value['CharacterDesignId1'], value['CharacterDesignId2'], value['ToCharacterDesignId']) for value in prestige_to_data.values()]
+
+    try:
+        recipes_by_char = await asyncio.gather(*[get_prestige_to_recipes(char_design_id) for char_design_id in char_design_ids])
+    except asyncio.CancelledError:
+        raise
+    except Exception as error:
+        print(f'[update_prestige_graph] {error.__class__.__name__} occurred while retrieving the prestige recipes: {error}')
+        return False
+
+    __prestige_graph = PrestigeGraph([recipe for recipes in recipes_by_char for recipe in recipes], data_version)
+    print(f'[update_prestige_graph] Loaded {__prestige_graph.recipe_count} prestige recipes of {len(char_design_ids)} characters for characters designs version {data_version}')
+    return True
+
+
+async def __prestige_graph_update_loop() -> None:
+    while True:
+        try:
+            await characters_designs_retriever.get_data_dict3()
+            if __prestige_graph is None or __prestige_graph.data_version != characters_designs_retriever.data_version:
+                await update_prestige_graph()
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            print(f'[prestige_graph_update_loop] {error.__class__.__name__} occurred while updating the prestige graph: {error}')
+        await asyncio.sleep(settings.PRESTIGE_GRAPH_CHECK_INTERVAL.total_seconds())
+
+
+def start_prestige_graph_updates() -> None:
+    global __prestige_graph_task
+    if __prestige_graph_task is None:
+        __prestige_graph_task = asyncio.ensure_future(__prestige_graph_update_loop())
+
+
+def stop_prestige_graph_updates() -> None:
+    global __prestige_graph_task
+    if __prestige_graph_task is not None:
+        __prestige_graph_task.cancel()
+        __prestige_graph_task = None
+
+
+
+
+
+
+
+
+
+
 # ---------- Level Info ----------
 
 def get_level_costs(from_level: int, to_level: int = None) -> list:
@@ -593,6 +1022,10 @@ characters_designs_retriever = entity.EntityDesignsRetriever(
 )
 
 
+characters_designs_retriever.register_view(COLLECTION_CHARACTERS_INDEX_VIEW_NAME, _create_collection_characters_index)
+characters_designs_retriever.register_view(CREW_STAT_TABLE_VIEW_NAME, CrewStatTable)
+
+
 collections_designs_retriever = entity.EntityDesignsRetriever(
     COLLECTION_DESIGN_BASE_PATH,
     COLLECTION_DESIGN_KEY_NAME,
@@ -632,7 +1065,8 @@ __properties: Dict[str, Union[entity.EntityDesignDetailProperty, List[entity.Ent
 
 
 async def init():
-    pass
+    if settings.PRESTIGE_GRAPH_ENABLED:
+        start_prestige_graph_updates()
 
 
 
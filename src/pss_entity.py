@@ -6,7 +6,7 @@ from collections import namedtuple
 import discord
 from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
 
-from cache import PssCache
+from cache import LruCache, PssCache
 import pss_core as core
 import settings
 import utility as util
@@ -294,6 +294,8 @@ class EntityDesignDetailsCollection():
 
 
 class EntityDesignsRetriever:
+    NAME_INDEX_VIEW_NAME: str = 'name_index'
+
     def __init__(self, entity_design_base_path: str, entity_design_key_name: str, entity_design_description_property_name: str, cache_name: str = None, sorted_key_function: Callable[[dict, dict], str] = None, fix_data_delegate: Callable[[str], str] = None, cache_update_interval: int = 10):
         self.__cache_name: str = cache_name or ''
         self.__base_path: str = entity_design_base_path
@@ -306,14 +308,40 @@ class EntityDesignsRetriever:
             self.__base_path,
             self.__cache_name,
             key_name=self.__key_name,
-            update_interval=cache_update_interval
+            update_interval=cache_update_interval,
+            background_refresh=True
         )
+        self.__cache.register_view(EntityDesignsRetriever.NAME_INDEX_VIEW_NAME, self.__create_name_index)
+        self.__lookup_memo: LruCache = LruCache(settings.ENTITY_LOOKUP_MEMO_SIZE)
+        self.__lookup_memo_data_version: int = None
+        # A retriever created later for the same cache replaces the earlier one
+        _ENTITY_DESIGNS_RETRIEVERS[self.__cache_name] = self
+
+
+    @property
+    def cache_name(self) -> str:
+        return self.__cache_name
+
+    @property
+    def data_version(self) -> int:
+        """
+        Increases every time the cached data changes. Can be used to key caches of data derived from the entity designs.
+        """
+        return self.__cache.data_version
+
+    @property
+    def lookup_memo(self) -> LruCache:
+        return self.__lookup_memo
 
 
     async def get_data_dict3(self) -> Dict[str, Dict[str, object]]:
         return await self.__cache.get_data_dict3()
 
 
+    async def get_raw_data(self) -> str:
+        return await self.__cache.get_raw_data()
+
+
     async def get_entity_design_info_by_name(self, entity_name: str, entities_designs_data: EntitiesDesignsData = None) -> Dict[str, object]:
         entities_designs_data = entities_designs_data or await self.get_data_dict3()
         entity_design_id = await self.get_entity_design_id_by_name(entity_name, entities_designs_data=entities_designs_data)
@@ -324,36 +352,83 @@ class EntityDesignsRetriever:
         entities_designs_data = entities_designs_data or await self.get_data_dict3()
         sorted_key_function = sorted_key_function or self.__sorted_key_function
 
-        entity_design_ids = await self.get_entities_designs_ids_by_name(entity_name, entities_designs_data=entities_designs_data)
-        entities_designs_data_keys = entities_designs_data.keys()
-        result = [entities_designs_data[entity_design_id] for entity_design_id in entity_design_ids if entity_design_id in entities_designs_data_keys]
-        if sorted_key_function is not None:
-            result = sorted(result, key=lambda entity_info: (
-                sorted_key_function(entity_info, entities_designs_data)
-            ))
+        memo_key = await self.__get_lookup_memo_key(entity_name, entities_designs_data, 'infos', sorted_key_function)
+        result = self.__lookup_memo.get(memo_key) if memo_key else None
+        if result is None:
+            entity_design_ids = await self.get_entities_designs_ids_by_name(entity_name, entities_designs_data=entities_designs_data)
+            entities_designs_data_keys = entities_designs_data.keys()
+            result = [entities_designs_data[entity_design_id] for entity_design_id in entity_design_ids if entity_design_id in entities_designs_data_keys]
+            if sorted_key_function is not None:
+                result = sorted(result, key=lambda entity_info: (
+                    sorted_key_function(entity_info, entities_designs_data)
+                ))
+            if memo_key:
+                self.__lookup_memo.set(memo_key, tuple(result))
 
-        return result
+        return list(result)
 
 
     async def get_entity_design_id_by_name(self, entity_name: str, entities_designs_data: EntitiesDesignsData = None) -> str:
         entities_designs_data = entities_designs_data or await self.get_data_dict3()
-        results = await self.get_entities_designs_ids_by_name(entity_name, entities_designs_data)
+        results = await self.get_entities_designs_ids_by_name(entity_name, entities_designs_data, limit=1)
         if len(results) > 0:
             return results[0]
         else:
             return None
 
 
-    async def get_entities_designs_ids_by_name(self, entity_name: str, entities_designs_data: EntitiesDesignsData = None) -> List[str]:
+    async def get_entities_designs_ids_by_name(self, entity_name: str, entities_designs_data: EntitiesDesignsData = None, limit: int = None) -> List[str]:
         entities_designs_data = entities_designs_data or await self.get_data_dict3()
-        results = core.get_ids_from_property_value(entities_designs_data, self.__description_property_name, entity_name, fix_data_delegate=self.__fix_data_delegate)
-        return results
+        memo_key = await self.__get_lookup_memo_key(entity_name, entities_designs_data, 'ids', limit)
+        results = self.__lookup_memo.get(memo_key) if memo_key else None
+        if results is None:
+            name_index = await self.__get_name_index(entities_designs_data)
+            results = core.get_ids_from_property_value_index(name_index, entity_name, fix_data_delegate=self.__fix_data_delegate, limit=limit)
+            if memo_key:
+                self.__lookup_memo.set(memo_key, tuple(results))
+        return list(results)
+
+
+    async def get_view(self, view_name: str) -> object:
+        """
+        Returns a view registered via register_view(). The view gets created once per data version on first access.
+        """
+        return await self.__cache.get_view(view_name)
+
+
+    def register_view(self, view_name: str, create_view: Callable[[EntitiesDesignsData], object]) -> None:
+        self.__cache.register_view(view_name, create_view)
 
 
     async def update_cache(self) -> None:
         await self.__cache.update_data()
 
 
+    async def __get_name_index(self, entities_designs_data: EntitiesDesignsData) -> core.PropertyValueIndex:
+        # The cached index can only be used, if the data to be searched is the cached data.
+        if entities_designs_data is await self.get_data_dict3():
+            return await self.__cache.get_view(EntityDesignsRetriever.NAME_INDEX_VIEW_NAME)
+        return self.__create_name_index(entities_designs_data)
+
+
+    def __create_name_index(self, entities_designs_data: EntitiesDesignsData) -> core.PropertyValueIndex:
+        return core.create_property_value_index(entities_designs_data, self.__description_property_name, fix_data_delegate=self.__fix_data_delegate)
+
+
+    async def __get_lookup_memo_key(self, entity_name: str, entities_designs_data: EntitiesDesignsData, *lookup_mode) -> tuple:
+        """
+        Returns the key for memoizing the result of a lookup or None, if the result shouldn't be memoized. Only lookups in the cached data get memoized. The memo gets cleared, when the cached data changes.
+        """
+        if not entity_name or entities_designs_data is not await self.get_data_dict3():
+            return None
+        data_version = self.__cache.data_version
+        if data_version != self.__lookup_memo_data_version:
+            self.__lookup_memo.clear()
+            self.__lookup_memo_data_version = data_version
+        fix_data_delegate = self.__fix_data_delegate or core.fix_property_value
+        return (fix_data_delegate(entity_name), lookup_mode, data_version)
+
+
 
 
 
@@ -364,6 +439,14 @@ class EntityDesignsRetriever:
 
 # ---------- Helper ----------
 
+_ENTITY_DESIGNS_RETRIEVERS: Dict[str, EntityDesignsRetriever] = {}
+
+
+def get_entity_designs_retrievers() -> List[EntityDesignsRetriever]:
+    return list(_ENTITY_DESIGNS_RETRIEVERS.values())
+
+
+
 def group_entities_designs_details(entities_designs_details: List[EntityDesignDetails], property_name: str) -> Dict[object, List[EntityDesignDetails]]:
     result = {}
     for entity_design_details in entities_designs_details:
@@ -4,7 +4,7 @@
 import discord
 import os
 import re
-from typing import Callable, Dict, List, Optional, Tuple, Union
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
 
 import pss_assert
 from cache import PssCache
@@ -25,6 +25,7 @@ import utility as util
 ITEM_DESIGN_BASE_PATH = 'ItemService/ListItemDesigns2?languageKey=en'
 ITEM_DESIGN_KEY_NAME = 'ItemDesignId'
 ITEM_DESIGN_DESCRIPTION_PROPERTY_NAME = 'ItemDesignName'
+ITEM_CRAFTING_GRAPH_VIEW_NAME = 'crafting_graph'
 
 
 
@@ -71,6 +72,95 @@ class ItemDesignDetails(entity.EntityDesignDetails):
 
 
 
+class ItemCraftingGraph:
+    """
+    Holds the crafting recipes of all items as a directed acyclic graph. The ingredient tiers of an item get calculated once on first access and are built from the memoized tiers of its ingredients, so shared sub-recipes only get expanded once.
+
+    Tier 0 lists the direct ingredients of an item. Each following tier replaces the craftable ingredients of the previous tier with their ingredients, so the last tier lists the raw materials required. Void particles and fragments are omitted.
+    """
+    def __init__(self, items_designs_data: entity.EntitiesDesignsData):
+        self.__ingredients: Dict[str, Dict[str, int]] = {item_id: _get_crafting_ingredients(item_info, items_designs_data) for item_id, item_info in items_designs_data.items()}
+        self.__tiers_by_depth: Dict[str, List[List[Dict[str, int]]]] = {}
+        self.__tiers: Dict[str, List[Dict[str, int]]] = {}
+
+
+    def get_ingredients(self, item_id: str) -> Dict[str, int]:
+        """
+        Returns the amounts of the direct ingredients of an item by item design id. The returned dict must not be modified.
+        """
+        return self.__ingredients.get(item_id, {})
+
+
+    def get_ingredients_tiers(self, item_id: str) -> List[Dict[str, int]]:
+        """
+        Returns the amounts of ingredients by item design id for each tier of the crafting tree of an item. Returns an empty list, if the item can't be crafted. The returned dicts must not be modified.
+        """
+        result = self.__tiers.get(item_id)
+        if result is None:
+            result = []
+            for depth_ingredients in self.__get_tiers_by_depth(item_id, set()):
+                tier_ingredients = {}
+                # Ingredients deeper in the crafting tree are listed first
+                for ingredients in reversed(depth_ingredients):
+                    for ingredient_id, amount in ingredients.items():
+                        tier_ingredients[ingredient_id] = tier_ingredients.get(ingredient_id, 0) + amount
+                result.append(tier_ingredients)
+            self.__tiers[item_id] = result
+        return result
+
+
+    def get_raw_materials(self, item_id: str) -> Dict[str, int]:
+        """
+        Returns the amounts of raw materials by item design id required to craft an item. The returned dict must not be modified.
+        """
+        tiers = self.get_ingredients_tiers(item_id)
+        if tiers:
+            return tiers[-1]
+        return {}
+
+
+    def __get_tiers_by_depth(self, item_id: str, visited_item_ids: Set[str]) -> List[List[Dict[str, int]]]:
+        """
+        Returns for each tier the ingredients grouped by their depth in the crafting tree of the item.
+        """
+        result = self.__tiers_by_depth.get(item_id)
+        if result is not None:
+            return result
+        # Items being part of their own crafting tree would lead to endless recursion, so treat them as raw materials.
+        if item_id in visited_item_ids:
+            return []
+        visited_item_ids.add(item_id)
+        ingredients_tiers = [(ingredient_id, amount, self.__get_tiers_by_depth(ingredient_id, visited_item_ids)) for ingredient_id, amount in self.get_ingredients(item_id).items()]
+        visited_item_ids.remove(item_id)
+
+        result = []
+        if ingredients_tiers:
+            tier_count = 1 + max([len(tiers) for _, _, tiers in ingredients_tiers])
+            for tier in range(tier_count):
+                depth_ingredients = [{}]
+                for ingredient_id, amount, tiers in ingredients_tiers:
+                    if tier == 0 or not tiers:
+                        depth_ingredients[0][ingredient_id] = depth_ingredients[0].get(ingredient_id, 0) + amount
+                    else:
+                        # Once all of its ingredients are raw materials, an ingredient's last tier stays the same
+                        for depth, sub_ingredients in enumerate(tiers[min(tier, len(tiers)) - 1], 1):
+                            if depth == len(depth_ingredients):
+                                depth_ingredients.append({})
+                            for sub_ingredient_id, sub_amount in sub_ingredients.items():
+                                depth_ingredients[depth][sub_ingredient_id] = depth_ingredients[depth].get(sub_ingredient_id, 0) + amount * sub_amount
+                result.append(depth_ingredients)
+        self.__tiers_by_depth[item_id] = result
+        return result
+
+
+
+
+
+
+
+
+
+
 # ---------- Helper functions ----------
 
 def __get_item_bonus_type_and_value(item_info: entity.EntityDesignInfo, items_designs_data: entity.EntitiesDesignsData, **kwargs) -> str:
@@ -145,7 +235,7 @@ def __create_base_design_data_list_from_infos(items_designs_infos: List[entity.E
 
 
 def __get_key_for_best_items_sort(item_info: dict) -> str:
-    if item_info and item_info['EnhancementValue'] and item_info[ITEM_DESIGN_DESCRIPTION_PROPERTY_NAME]:
+    if item_info and item_info.get('EnhancementValue') and item_info[ITEM_DESIGN_DESCRIPTION_PROPERTY_NAME]:
         slot = item_info['ItemSubType']
         rarity_num = lookups.RARITY_ORDER_LOOKUP[item_info['Rarity']]
         enhancement_value = int((1000.0 - float(item_info['EnhancementValue'])) * 10)
@@ -231,13 +321,13 @@ def get_item_design_details_by_id(item_design_id: str, items_designs_data: dict)
         return None
 
 
-def _get_item_design_ids_from_name(item_name: str, items_designs_data: dict) -> list:
-    results = core.get_ids_from_property_value(items_designs_data, ITEM_DESIGN_DESCRIPTION_PROPERTY_NAME, item_name, fix_data_delegate=_fix_item_name)
+async def _get_item_design_ids_from_name(item_name: str, items_designs_data: dict, limit: int = None) -> list:
+    results = await items_designs_retriever.get_entities_designs_ids_by_name(item_name, entities_designs_data=items_designs_data, limit=limit)
     return results
 
 
-def _get_item_infos_by_name(item_name: str, items_designs_data: dict, return_best_match: bool = False) -> list:
-    item_design_ids = _get_item_design_ids_from_name(item_name, items_designs_data)
+async def _get_item_infos_by_name(item_name: str, items_designs_data: dict, return_best_match: bool = False) -> list:
+    item_design_ids = await _get_item_design_ids_from_name(item_name, items_designs_data, limit=(1 if return_best_match else None))
     result = [items_designs_data[item_design_id] for item_design_id in item_design_ids if item_design_id in items_designs_data.keys()]
 
     if result:
@@ -280,7 +370,7 @@ async def get_item_details_by_name(item_name: str, as_embed: bool = settings.USE
     pss_assert.valid_entity_name(item_name, allowed_values=ALLOWED_ITEM_NAMES)
 
     items_designs_data = await items_designs_retriever.get_data_dict3()
-    item_infos = _get_item_infos_by_name(item_name, items_designs_data)
+    item_infos = await _get_item_infos_by_name(item_name, items_designs_data)
 
     if not item_infos:
         return [f'Could not find an item named **{item_name}**.'], False
@@ -322,7 +412,7 @@ async def get_item_price(item_name: str, as_embed: bool = settings.USE_EMBEDS):
     pss_assert.valid_entity_name(item_name, allowed_values=ALLOWED_ITEM_NAMES)
 
     items_designs_data = await items_designs_retriever.get_data_dict3()
-    item_infos = _get_item_infos_by_name(item_name, items_designs_data)
+    item_infos = await _get_item_infos_by_name(item_name, items_designs_data)
 
     if not item_infos:
         return [f'Could not find an item named **{item_name}**.'], False
@@ -366,15 +456,15 @@ async def get_ingredients_for_item(item_name: str, as_embed: bool = settings.USE
     pss_assert.valid_entity_name(item_name, allowed_values=ALLOWED_ITEM_NAMES)
 
     items_designs_data = await items_designs_retriever.get_data_dict3()
-    item_infos = _get_item_infos_by_name(item_name, items_designs_data, return_best_match=True)
+    item_infos = await _get_item_infos_by_name(item_name, items_designs_data, return_best_match=True)
 
     if not item_infos:
         return [f'Could not find an item named **{item_name}**.'], False
     else:
         item_info = item_infos[0]
         item_name = item_info[ITEM_DESIGN_DESCRIPTION_PROPERTY_NAME]
-        ingredients_tree = _parse_ingredients_tree(item_info['Ingredients'], items_designs_data)
-        ingredients_dicts = _flatten_ingredients_tree(ingredients_tree)
+        item_crafting_graph: ItemCraftingGraph = await items_designs_retriever.get_view(ITEM_CRAFTING_GRAPH_VIEW_NAME)
+        ingredients_dicts = item_crafting_graph.get_ingredients_tiers(item_info[ITEM_DESIGN_KEY_NAME])
         if as_embed:
             return _get_item_ingredients_as_embed(item_name, ingredients_dicts, items_designs_data), True
         else:
@@ -411,24 +501,20 @@ def _get_item_ingredients_as_text(item_name, ingredients_dicts, item_design_data
     return lines
 
 
-def _parse_ingredients_tree(ingredients_str: str, item_design_data: dict, parent_amount: int = 1) -> list:
-    """returns a tree structure: [(item_id, item_amount, item_ingredients[])]"""
-    if not ingredients_str:
-        return []
-
+def _get_crafting_ingredients(item_info: entity.EntityDesignInfo, items_designs_data: entity.EntitiesDesignsData) -> Dict[str, int]:
+    """returns the amounts of the ingredients of an item by item design id"""
     # Ingredients format is: [<id>x<amount>][|<id>x<amount>]*
-    ingredients_dict = _get_ingredients_dict(ingredients_str)
-    result = []
+    ingredients_dict = _get_ingredients_dict(item_info['Ingredients'])
+    result = {}
 
     for item_id, item_amount in ingredients_dict.items():
-        item_info = item_design_data[item_id]
+        item_info = items_designs_data.get(item_id)
+        if item_info is None:
+            continue
         item_name = item_info[ITEM_DESIGN_DESCRIPTION_PROPERTY_NAME].lower()
-        item_amount = int(item_amount)
         # Filter out void particles and scrap
         if 'void particle' not in item_name and ' fragment' not in item_name:
-            combined_amount = item_amount * parent_amount
-            item_ingredients = _parse_ingredients_tree(item_info['Ingredients'], item_design_data, combined_amount)
-            result.append((item_id, combined_amount, item_ingredients))
+            result[item_id] = int(item_amount)
 
     return result
 
@@ -440,33 +526,6 @@ def _get_ingredients_dict(ingredients: str) -> dict:
     return result
 
 
-def _flatten_ingredients_tree(ingredients_tree: list) -> list:
-    """Returns a list of dicts"""
-    ingredients = {}
-    ingredients_without_subs = []
-    sub_ingredients = []
-
-    for item_id, item_amount, item_ingredients in ingredients_tree:
-        if item_id in ingredients.keys():
-            ingredients[item_id] += item_amount
-        else:
-            ingredients[item_id] = item_amount
-
-        if item_ingredients:
-            sub_ingredients.extend(item_ingredients)
-        else:
-            ingredients_without_subs.append((item_id, item_amount, item_ingredients))
-
-    result = [ingredients]
-
-    if len(ingredients_without_subs) != len(ingredients_tree):
-        sub_ingredients.extend(ingredients_without_subs)
-        flattened_subs = _flatten_ingredients_tree(sub_ingredients)
-        result.extend(flattened_subs)
-
-    return result
-
-
 
 
 
@@ -477,7 +536,7 @@ async def get_item_upgrades_from_name(item_name: str, as_embed: bool = settings.
     pss_assert.valid_entity_name(item_name, allowed_values=ALLOWED_ITEM_NAMES)
 
     items_designs_data = await items_designs_retriever.get_data_dict3()
-    item_ids = _get_item_design_ids_from_name(item_name, items_designs_data)
+    item_ids = await _get_item_design_ids_from_name(item_name, items_designs_data)
 
     if not item_ids:
         return [f'Could not find an item named **{item_name}**.'], False
@@ -648,6 +707,7 @@ items_designs_retriever: entity.EntityDesignsRetriever = entity.EntityDesignsRet
     'ItemsDesigns',
     fix_data_delegate=_fix_item_name
 )
+items_designs_retriever.register_view(ITEM_CRAFTING_GRAPH_VIEW_NAME, ItemCraftingGraph)
 __properties: Dict[str, Union[entity.EntityDesignDetailProperty, List[entity.EntityDesignDetailProperty]]] = {
     'title': entity.EntityDesignDetailProperty('Title', False, entity_property_name=ITEM_DESIGN_DESCRIPTION_PROPERTY_NAME),
     'description': entity.EntityDesignDetailProperty('Description', False, transform_function=__get_rarity),
@@ -1,4 +1,3 @@
-import aiohttp
 import datetime
 import hashlib
 import random
@@ -114,9 +113,9 @@ class Device():
         base_url = await core.get_base_url()
         url = f'{base_url}{self.__login_path}'
         utc_now = util.get_utcnow()
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url) as response:
-                data = await response.text(encoding='utf-8')
+        session = core.get_http_session()
+        async with session.post(url) as response:
+            data = await response.text(encoding='utf-8')
         result = core.convert_raw_xml_to_dict(data)
         self.__last_login = utc_now
         if 'UserService' in result.keys():
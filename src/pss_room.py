@@ -317,8 +317,8 @@ async def _get_wikia_link(room_name: str) -> str:
     if room_name:
         room_name = room_name.split(' Lv')[0]
         room_name = '_'.join([part.lower().capitalize() for part in room_name.split(' ')])
-        result = await util.get_wikia_link(room_name)
-        if await util.check_hyperlink(result):
+        result = await core.get_wikia_link(room_name)
+        if await core.check_hyperlink(result):
             return f'<{result}>'
         else:
             return ''
@@ -586,7 +586,7 @@ async def get_room_details_from_name(room_name: str, as_embed: bool = settings.U
     pss_assert.valid_entity_name(room_name, allowed_values=__allowed_room_names)
 
     rooms_designs_data = await rooms_designs_retriever.get_data_dict3()
-    room_infos = _get_room_infos(room_name, rooms_designs_data)
+    room_infos = await _get_room_infos(room_name, rooms_designs_data)
 
     if not room_infos:
         return [f'Could not find a room named **{room_name}**.'], False
@@ -598,8 +598,8 @@ async def get_room_details_from_name(room_name: str, as_embed: bool = settings.U
             return (await _get_room_info_as_text(room_name, room_infos, rooms_designs_data, items_designs_data)), True
 
 
-def _get_room_infos(room_name: str, rooms_designs_data: entity.EntitiesDesignsData) -> List[entity.EntityDesignInfo]:
-    room_design_ids = _get_room_design_ids_from_name(room_name, rooms_designs_data)
+async def _get_room_infos(room_name: str, rooms_designs_data: entity.EntitiesDesignsData) -> List[entity.EntityDesignInfo]:
+    room_design_ids = await _get_room_design_ids_from_name(room_name, rooms_designs_data)
     if not room_design_ids:
         room_design_ids = _get_room_design_ids_from_room_shortname(room_name, rooms_designs_data)
 
@@ -607,8 +607,8 @@ def _get_room_infos(room_name: str, rooms_designs_data: entity.EntitiesDesignsDa
     return result
 
 
-def _get_room_design_ids_from_name(room_name: str, rooms_designs_data: entity.EntitiesDesignsData) -> List[str]:
-    results = core.get_ids_from_property_value(rooms_designs_data, ROOM_DESIGN_DESCRIPTION_PROPERTY_NAME, room_name)
+async def _get_room_design_ids_from_name(room_name: str, rooms_designs_data: entity.EntitiesDesignsData) -> List[str]:
+    results = await rooms_designs_retriever.get_entities_designs_ids_by_name(room_name, entities_designs_data=rooms_designs_data)
     return results
 
 
@@ -660,8 +660,8 @@ def _get_key_for_room_sort(room_info: dict, rooms_designs_data: dict) -> str:
 
 # ---------- Initilization ----------
 
-rooms_designs_retriever: entity.EntityDesignsRetriever
-rooms_designs_purchases_retriever: entity.EntityDesignsRetriever
+rooms_designs_retriever: entity.EntityDesignsRetriever = None
+rooms_designs_purchases_retriever: entity.EntityDesignsRetriever = None
 __allowed_room_names: List[str]
 #__room_details_properties schema:
 # - Display name
@@ -685,19 +685,22 @@ def __get_allowed_room_short_names(rooms_designs_data: dict):
 async def init():
     global rooms_designs_retriever
     global rooms_designs_purchases_retriever
-    rooms_designs_retriever = entity.EntityDesignsRetriever(
-        ROOM_DESIGN_BASE_PATH,
-        ROOM_DESIGN_KEY_NAME,
-        ROOM_DESIGN_DESCRIPTION_PROPERTY_NAME,
-        cache_name='RoomDesigns',
-        sorted_key_function=_get_key_for_room_sort
-    )
-    rooms_designs_purchases_retriever = entity.EntityDesignsRetriever(
-        ROOM_DESIGN_PURCHASE_BASE_PATH,
-        ROOM_DESIGN_PURCHASE_KEY_NAME,
-        ROOM_DESIGN_PURCHASE_DESCRIPTION_PROPERTY_NAME,
-        cache_name='RoomDesignPurchases'
-    )
+    # on_ready may fire again after a reconnect, so the retrievers must only be created once
+    if rooms_designs_retriever is None:
+        rooms_designs_retriever = entity.EntityDesignsRetriever(
+            ROOM_DESIGN_BASE_PATH,
+            ROOM_DESIGN_KEY_NAME,
+            ROOM_DESIGN_DESCRIPTION_PROPERTY_NAME,
+            cache_name='RoomDesigns',
+            sorted_key_function=_get_key_for_room_sort
+        )
+    if rooms_designs_purchases_retriever is None:
+        rooms_designs_purchases_retriever = entity.EntityDesignsRetriever(
+            ROOM_DESIGN_PURCHASE_BASE_PATH,
+            ROOM_DESIGN_PURCHASE_KEY_NAME,
+            ROOM_DESIGN_PURCHASE_DESCRIPTION_PROPERTY_NAME,
+            cache_name='RoomDesignPurchases'
+        )
 
     global __allowed_room_names
     rooms_designs_data = await rooms_designs_retriever.get_data_dict3()
@@ -34,7 +34,8 @@ __ship_designs_cache = PssCache(
     SHIP_DESIGN_BASE_PATH,
     'ShipDesigns',
     SHIP_DESIGN_KEY_NAME,
-    update_interval=60)
+    update_interval=60,
+    background_refresh=True)
 
 
 
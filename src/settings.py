@@ -13,6 +13,12 @@ API_DATETIME_FORMAT_CUSTOM = '%d.%m.%y %H:%M'
 BASE_INVITE_URL = 'https://discordapp.com/oauth2/authorize?scope=bot&permissions=388160&client_id='
 
 
+CACHE_DATA_COMPRESSION_LEVEL = int(os.environ.get('CACHE_DATA_COMPRESSION_LEVEL', 6))
+CACHE_REFRESH_AHEAD_RATIO = 0.2
+CACHE_REFRESH_JITTER_RATIO = 0.1
+CACHE_REFRESH_RETRY_DELAY: datetime.timedelta = datetime.timedelta(minutes=1)
+
+
 DATABASE_URL = str(os.environ.get('DATABASE_URL'))
 
 DEFAULT_PRODUCTION_SERVER = 'api.pixelstarships.com'
@@ -23,6 +29,8 @@ DEFAULT_USE_EMOJI_PAGINATOR = True
 
 EMPTY_LINE = '\u200b'
 
+ENTITY_LOOKUP_MEMO_SIZE = 256
+
 
 EXCEL_COLUMN_FORMAT_DATETIME = 'YYYY-MM-DD hh:MM:ss'
 EXCEL_COLUMN_FORMAT_NUMBER = '0'
@@ -38,6 +46,11 @@ GDRIVE_SERVICE_ACCOUNT_FILE = 'client_secrets.json'
 GDRIVE_SETTINGS_FILE = 'settings.yaml'
 GDRIVE_SCOPES = ['https://www.googleapis.com/auth/drive']
 
+HTTP_CONNECTION_LIMIT = int(os.environ.get('HTTP_CONNECTION_LIMIT', 100))
+HTTP_CONNECTION_LIMIT_PER_HOST = int(os.environ.get('HTTP_CONNECTION_LIMIT_PER_HOST', 20))
+HTTP_DNS_CACHE_TTL = int(os.environ.get('HTTP_DNS_CACHE_TTL', 300))
+HTTP_KEEPALIVE_TIMEOUT = float(os.environ.get('HTTP_KEEPALIVE_TIMEOUT', 30.0))
+
 LATEST_SETTINGS_BASE_PATH = 'SettingService/GetLatestVersion3?deviceType=DeviceTypeAndroid&languageKey='
 
 MAXIMUM_CHARACTERS = 1900
@@ -47,7 +60,16 @@ ONE_SECOND: datetime.timedelta = datetime.timedelta(seconds=1)
 
 POST_AUTODAILY_FROM: datetime.datetime = datetime.datetime(2020, 2, 7, tzinfo=datetime.timezone.utc)
 PREFIX_DEFAULT = '/'
+PRESTIGE_CACHE_IDLE_TTL: datetime.timedelta = datetime.timedelta(minutes=int(os.environ.get('PRESTIGE_CACHE_IDLE_TTL_MINUTES', 60)))
+PRESTIGE_CACHE_MAX_SIZE = int(os.environ.get('PRESTIGE_CACHE_MAX_SIZE', 100))
+PRESTIGE_GRAPH_CHECK_INTERVAL: datetime.timedelta = datetime.timedelta(minutes=5)
+PRESTIGE_GRAPH_ENABLED = str(os.environ.get('PRESTIGE_GRAPH_ENABLED', 'false')).lower() in ('1', 'true', 'yes')
+PRESTIGE_GRAPH_LOAD_CONCURRENCY = int(os.environ.get('PRESTIGE_GRAPH_LOAD_CONCURRENCY', 5))
+PRESTIGE_PATH_MAX_SEARCH_NODES = 20000
+PRESTIGE_PATH_MAX_STEPS = 4
 PRINT_DEBUG = False
+PRODUCTION_SERVER_CACHE_DURATION: datetime.timedelta = datetime.timedelta(minutes=30)
+PRODUCTION_SERVER_UPDATE_INTERVAL: datetime.timedelta = datetime.timedelta(minutes=10)
 
 PSS_ABOUT_FILES = ['src/data/about.json', 'data/about.json']
 PSS_LINKS_FILES = ['src/data/links.json', 'data/links.json']
@@ -60,6 +82,8 @@ SETTINGS_TABLE_NAME = 'settings'
 SETTINGS_TYPES = ['boolean','float','int','text','timestamputc']
 
 
+TOP_CREW_MAX_COUNT = 50
+
 USE_EMBEDS = False
 
 VERSION = '1.2.8.4'
@@ -68,6 +92,14 @@ VERSION = '1.2.8.4'
 WIKIA_BASE_ADDRESS = 'https://pixelstarships.fandom.com/wiki/'
 
 
+XML_INTERNED_VALUE_PROPERTY_NAMES = [property_name.strip() for property_name in str(os.environ.get('XML_INTERNED_VALUE_PROPERTY_NAMES', 'CategoryType,EnhancementType,GenderType,ItemSubType,ItemType,ManufactureType,ProgressionType,RaceType,Rarity,RoomType,SpecialAbilityType')).split(',') if property_name.strip()]
+XML_PARSER_BACKEND = str(os.environ.get('XML_PARSER_BACKEND', 'stdlib'))
+# 'thread', 'process' or 'none'. A process executor keeps the event loop fully responsive while parsing, but each worker is a fork of the bot that keeps its peak parsing heap alive, so it roughly doubles the resident memory. The workers get forked at startup, before the bot connects to Discord.
+XML_PARSE_EXECUTOR_TYPE = str(os.environ.get('XML_PARSE_EXECUTOR_TYPE', 'thread'))
+XML_PARSE_EXECUTOR_WORKERS = int(os.environ.get('XML_PARSE_EXECUTOR_WORKERS', 1))
+XML_PARSE_OFFLOAD_THRESHOLD = int(os.environ.get('XML_PARSE_OFFLOAD_THRESHOLD', 100000))
+
+
 
 
 
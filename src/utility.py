@@ -1,4 +1,3 @@
-import aiohttp
 from datetime import date, datetime, time, timedelta, timezone
 import calendar
 import discord
@@ -276,36 +275,6 @@ def format_up_to_decimals(num: float, max_decimal_count: int = settings.DEFAULT_
     return result
 
 
-async def get_wikia_link(page_name: str) -> str:
-    page_name = '_'.join([part for part in page_name.split(' ')])
-    page_name = '_'.join([part.lower().capitalize() for part in page_name.split('_')])
-    result = f'{settings.WIKIA_BASE_ADDRESS}{page_name}'
-
-    if not (await check_hyperlink(result)):
-        page_name_split = page_name.split('_')
-        if len(page_name_split) > 1:
-            page_name = f'{page_name_split[0].upper()}_{"_".join(page_name_split[1:])}'
-        else:
-            page_name = page_name.upper()
-    result = f'{settings.WIKIA_BASE_ADDRESS}{page_name}'
-
-    if not (await check_hyperlink(result)):
-        result = ''
-
-    return result
-
-
-async def check_hyperlink(hyperlink: str) -> bool:
-    if hyperlink:
-        session: aiohttp.ClientSession
-        async with aiohttp.ClientSession() as session:
-            response: aiohttp.ClientResponse
-            async with session.get(hyperlink) as response:
-                return response.status == 200
-    else:
-        return False
-
-
 async def try_delete_original_message(ctx: discord.ext.commands.Context) -> bool:
     return await try_delete_message(ctx.message)
 
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# Run from the repository root: python -m pytest tests
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import pss_core as core
+
+
+
+
+
+
+
+
+
+
+# ---------- Fixtures ----------
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def _read_fixture(file_name: str) -> str:
+    with open(os.path.join(FIXTURES_PATH, file_name), 'r', encoding='utf-8') as fixture_file:
+        return fixture_file.read()
+
+
+# Trimmed payloads of the endpoints retrieved by the entity design retrievers
+PAYLOADS_XML = {file_name[:-4]: _read_fixture(file_name) for file_name in sorted(os.listdir(FIXTURES_PATH)) if file_name.endswith('.xml')}
+
+COMMENTS_AND_PROCESSING_INSTRUCTIONS_XML = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<!-- Service comment -->'
+    '<ListAllCharacterDesignsService>'
+    '<?pss-debug before-list?>'
+    '<ListAllCharacterDesigns>'
+    '<!-- List comment -->'
+    '<CharacterDesigns>'
+    '<CharacterDesign CharacterDesignId="1" CharacterDesignName="Alpha" Rarity="Common" />'
+    '<!-- Between characters -->'
+    '<?pss-debug between-characters?>'
+    '<CharacterDesign CharacterDesignId="2" CharacterDesignName="Beta" Rarity="Elite">'
+    '<!-- Inside a character -->'
+    '<?pss-debug inside-character?>'
+    '</CharacterDesign>'
+    '</CharacterDesigns>'
+    '</ListAllCharacterDesigns>'
+    '</ListAllCharacterDesignsService>'
+)
+
+XML_ATTRIBUTES_XML = (
+    '<ListRoomDesigns2Service>'
+    '<ListRoomDesigns>'
+    '<RoomDesigns>'
+    '<RoomDesign RoomDesignId="1" RoomName="Laser" RoomType="Laser"'
+    ' MissileDesignXml="&lt;MissileDesign SystemDamage=&quot;1.5&quot; Volley=&quot;2&quot;&gt;&lt;!-- Comment --&gt;&lt;/MissileDesign&gt;" />'
+    '<RoomDesign RoomDesignId="2" RoomName="Bridge" RoomType="Bridge" MissileDesignXml="" />'
+    '</RoomDesigns>'
+    '</ListRoomDesigns>'
+    '</ListRoomDesigns2Service>'
+)
+
+ID_KEY_COLLISIONS_XML = (
+    '<ListAllCharacterDesignsService>'
+    '<ListAllCharacterDesigns>'
+    '<CharacterDesigns>'
+    '<CharacterDesign CharacterDesignId="1" CharacterDesignName="First" />'
+    '<CharacterDesign CharacterDesignId="1" CharacterDesignName="Duplicate" />'
+    '<CharacterDesign CharacterDesignId="2" CharacterDesignName="Second" />'
+    '<Prestige CharacterDesignId1="3" CharacterDesignId2="4" ToCharacterDesignId="5" />'
+    '<Prestige CharacterDesignId1="4" CharacterDesignId2="3" ToCharacterDesignId="6" />'
+    '<Prestige CharacterDesignId1="3" CharacterDesignId2="5" ToCharacterDesignId="7" />'
+    '<Unknown Name="Tag" />'
+    '</CharacterDesigns>'
+    '</ListAllCharacterDesigns>'
+    '</ListAllCharacterDesignsService>'
+)
+
+# Siblings with the same tag at depth 1 can't be streamed, so xmltree_to_dict3() falls back to convert_raw_xml_to_dict()
+DUPLICATE_CONTAINER_XML = (
+    '<ListAllCharacterDesignsService>'
+    '<ListAllCharacterDesigns>'
+    '<CharacterDesigns><CharacterDesign CharacterDesignId="1" CharacterDesignName="First" /></CharacterDesigns>'
+    '</ListAllCharacterDesigns>'
+    '<ListAllCharacterDesigns>'
+    '<CharacterDesigns><CharacterDesign CharacterDesignId="2" CharacterDesignName="Second" /></CharacterDesigns>'
+    '</ListAllCharacterDesigns>'
+    '</ListAllCharacterDesignsService>'
+)
+
+ALL_XML = {
+    'comments_and_processing_instructions': COMMENTS_AND_PROCESSING_INSTRUCTIONS_XML,
+    'xml_attributes': XML_ATTRIBUTES_XML,
+    'id_key_collisions': ID_KEY_COLLISIONS_XML,
+    'duplicate_container': DUPLICATE_CONTAINER_XML,
+    **PAYLOADS_XML
+}
+
+
+@pytest.fixture(params=core.get_xml_parser_backend_names())
+def backend_name(request) -> str:
+    selected_backend_name = core.get_xml_parser_backend().name
+    core.select_xml_parser_backend(request.param)
+    yield request.param
+    core.select_xml_parser_backend(selected_backend_name)
+
+
+def _get_results(raw_xml: str) -> tuple:
+    """
+    Returns the results of convert_raw_xml_to_dict() and xmltree_to_dict3() and the decoded values of all *Xml attributes in the result of xmltree_to_dict3().
+    """
+    data_dict3 = core.xmltree_to_dict3(raw_xml)
+    decoded_xml_attributes = {
+        key: {property_name[:-3]: entity_info.get(property_name[:-3]) for property_name in list(dict.keys(entity_info)) if property_name.endswith('Xml')}
+        for key, entity_info in data_dict3.items()
+    }
+    return (core.convert_raw_xml_to_dict(raw_xml), data_dict3, decoded_xml_attributes)
+
+
+def _get_results_for_backend(raw_xml: str, backend_name: str) -> tuple:
+    selected_backend_name = core.get_xml_parser_backend().name
+    core.select_xml_parser_backend(backend_name)
+    try:
+        return _get_results(raw_xml)
+    finally:
+        core.select_xml_parser_backend(selected_backend_name)
+
+
+
+
+
+
+
+
+
+
+# ---------- Tests ----------
+
+@pytest.mark.parametrize('raw_xml', list(ALL_XML.values()), ids=list(ALL_XML.keys()))
+def test_backends_produce_identical_dicts(raw_xml: str, backend_name: str):
+    assert core.check_xml_parser_backend_parity(raw_xml, backend_name)
+    expected = _get_results_for_backend(raw_xml, 'stdlib')
+    assert _get_results(raw_xml) == expected
+
+
+@pytest.mark.parametrize('raw_xml', list(ALL_XML.values()), ids=list(ALL_XML.keys()))
+def test_xmltree_to_dict3_matches_full_conversion(raw_xml: str, backend_name: str):
+    root = core.convert_raw_xml_to_dict(raw_xml)
+    expected = {}
+    for c in root.values():
+        for cc in c.values():
+            if isinstance(cc, dict):
+                expected = next(ccc for ccc in cc.values() if isinstance(ccc, dict))
+                break
+    assert core.xmltree_to_dict3(raw_xml) == expected
+
+
+def test_comments_and_processing_instructions_are_ignored(backend_name: str):
+    result = core.xmltree_to_dict3(COMMENTS_AND_PROCESSING_INSTRUCTIONS_XML)
+    assert list(result.keys()) == ['1', '2']
+    assert result['1'] == {'CharacterDesignId': '1', 'CharacterDesignName': 'Alpha', 'Rarity': 'Common'}
+    assert result['2'] == {'CharacterDesignId': '2', 'CharacterDesignName': 'Beta', 'Rarity': 'Elite'}
+
+
+def test_xml_attributes_get_converted_on_access(backend_name: str):
+    result = core.xmltree_to_dict3(XML_ATTRIBUTES_XML)
+    laser = result['1']
+    assert 'MissileDesign' not in laser.keys()
+    assert 'MissileDesign' in laser
+    assert laser['MissileDesign'] == {'MissileDesign': {'SystemDamage': '1.5', 'Volley': '2'}}
+    assert laser.get('MissileDesign') is laser['MissileDesign']
+
+    bridge = result['2']
+    assert 'MissileDesign' not in bridge
+    assert bridge.get('MissileDesign', None) is None
+    with pytest.raises(KeyError):
+        bridge['MissileDesign']
+
+
+def test_id_key_collisions_keep_the_first_element(backend_name: str):
+    result = core.xmltree_to_dict3(ID_KEY_COLLISIONS_XML)
+    assert list(result.keys()) == ['1', '2', '3.4', '3.5', 'Unknown']
+    assert result['1']['CharacterDesignName'] == 'First'
+    assert result['3.4']['ToCharacterDesignId'] == '5'
+    assert result['3.5']['ToCharacterDesignId'] == '7'
+
+
+def test_duplicate_containers_keep_the_first_container(backend_name: str):
+    result = core.xmltree_to_dict3(DUPLICATE_CONTAINER_XML)
+    assert list(result.keys()) == ['CharacterDesign']
+    assert result['CharacterDesign']['CharacterDesignName'] == 'First'
+
+
+def test_list_item_designs_payload(backend_name: str):
+    result = core.xmltree_to_dict3(PAYLOADS_XML['ListItemDesigns2'])
+    assert list(result.keys()) == ['1', '26', '27', '150', '151', '300']
+    assert result['27']['ItemDesignDescription'] == 'Fragments & shards.'
+    assert result['150']['ItemDesignDescription'] == '"Better than nothing."'
+    assert result['151']['Ingredients'] == '150x1|27x3'
+
+
+def test_list_room_designs_payload(backend_name: str):
+    result = core.xmltree_to_dict3(PAYLOADS_XML['ListRoomDesigns2'])
+    assert list(result.keys()) == ['1', '5', '6', '20']
+    assert result['6']['MissileDesign'] == {
+        'MissileDesignId': '4', 'SystemDamage': '1.5', 'ShieldDamage': '1.5', 'CharacterDamage': '0', 'HullDamage': '1.5', 'DirectSystemDamage': '0', 'Volley': '2', 'VolleyDelay': '10', 'EMPLength': '0'
+    }
+    assert 'MissileDesign' not in result['20']
+
+
+def test_list_all_character_designs_payload(backend_name: str):
+    result = core.xmltree_to_dict3(PAYLOADS_XML['ListAllCharacterDesigns2'])
+    assert list(result.keys()) == ['1', '3', '4', '5']
+    assert result['5']['CharacterDesignName'] == 'Ace "Maverick"'
+    assert result['5']['CharacterDesignDescription'] == 'Flies anything \u2014 fast.'
+    assert result['3']['FinalEngine'] == '45'
+
+
+def test_prestige_character_to_payload(backend_name: str):
+    result = core.xmltree_to_dict3(PAYLOADS_XML['PrestigeCharacterTo'])
+    # Recipes listing the same characters in a different order share the id key
+    assert list(result.keys()) == ['3.4', '1.4', '1.1']
+    assert result['3.4'] == {'CharacterDesignId1': '3', 'CharacterDesignId2': '4', 'ToCharacterDesignId': '5'}